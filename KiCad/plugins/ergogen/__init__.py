@@ -1,2 +1,8 @@
-from .ergogen_action import ErgogenPluginAction  # Note the relative import!
-ErgogenPluginAction().register()  # Instantiate and register to Pcbnew
+import sys
+
+# KiCad's plugin loader (pcbnew.LoadPlugins) imports the package with pcbnew already loaded. The command line tools
+# (python -m ergogen) and their batch worker processes import it before pcbnew, they don't need wx and must not register
+# the action plugin, so it's only imported and registered when loaded by KiCad
+if 'pcbnew' in sys.modules:
+    from .ergogen_action import ErgogenPluginAction  # Note the relative import!
+    ErgogenPluginAction().register()  # Instantiate and register to Pcbnew
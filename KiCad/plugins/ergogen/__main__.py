@@ -1 +1,134 @@
 #
+# Command line entry point, run from the plugins folder with KiCad's python (see setup_env.fish):
+#   python -m ergogen replay <snapshot> [--repeat N] [--profile]
+#   python -m ergogen extract <board.kicad_pcb> --ref SW1 [--footprints 'SW*' ...] [--output routes.yaml]
+#   python -m ergogen watch <board.kicad_pcb> --ref SW1 [--footprints 'SW*' ...] --output routes.yaml [--interval S] [--budget S]
+#   python -m ergogen batch <batch.json> [--workers N] [--cache DIR] [--report report.json]
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+
+from .batch import load_batch, run_batch, summary, write_report
+
+from .headless import ExtractOptions, extract, watch, write_if_changed
+from .snapshot import replay_snapshot
+
+
+def get_extract_options(args) -> ExtractOptions:
+    nets_map: dict[str, str] = {}
+    for net in args.net:
+        name, _, value = net.partition('=')
+        nets_map[name] = value
+    router_config = {
+        'ref_fp_name': args.ref,
+        'nets_map': nets_map,
+        'include_locked_tracks_vias': args.include_locked,
+        'place_nets': not args.no_place_nets,
+        'tab_size': args.tab_size,
+        'fp_sec_name': args.name,
+        'where_filter': args.where,
+        'compact': args.compact,
+        'extra_ref_fp_names': args.extra_ref,
+        'cleanup': args.cleanup,
+        'mirror': args.mirror,
+    }
+    return ExtractOptions(args.footprints or [args.ref] + args.extra_ref, router_config)
+
+
+def replay_command(args):
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        result, timings = replay_snapshot(args.snapshot, args.repeat)
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(30)
+    else:
+        result, timings = replay_snapshot(args.snapshot, args.repeat)
+    print(result)
+    print(f'# {len(timings)} run(s): min {min(timings):.4f}s, avg {sum(timings) / len(timings):.4f}s, max {max(timings):.4f}s', file=sys.stderr)
+
+
+def extract_command(args):
+    yaml, _ = extract(args.board, get_extract_options(args))
+    if args.output:
+        write_if_changed(args.output, yaml)
+    else:
+        print(yaml)
+
+
+def watch_command(args):
+    try:
+        watch(args.board, get_extract_options(args), args.output, args.interval, args.budget,
+              report=lambda message: print(message, file=sys.stderr))
+    except KeyboardInterrupt:
+        pass
+
+
+def batch_command(args):
+    start_time = time.perf_counter()
+    results = run_batch(load_batch(args.batch), args.workers, None if args.no_cache else args.cache)
+    elapsed = time.perf_counter() - start_time
+    for line in summary(results, elapsed):
+        print(line, file=sys.stderr)
+    if args.report:
+        write_report(args.report, results, elapsed)
+    if any(result.status == 'failed' for result in results):
+        sys.exit(1)
+
+
+def add_extract_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('board', help='KiCad board file (.kicad_pcb)')
+    parser.add_argument('--ref', required=True, help='Reference of the footprint routes are relative to (e.g. SW1)')
+    parser.add_argument('--footprints', nargs='*', default=[],
+                        help='Reference patterns of the footprints whose connected tracks are extracted (default: the reference footprints)')
+    parser.add_argument('--extra-ref', nargs='*', default=[], help='Additional reference footprints, a router block is generated per reference')
+    parser.add_argument('--net', action='append', default=[], help='Net placeholder mapping NET=VALUE, may be repeated')
+    parser.add_argument('--name', default='', help='Name of the router footprint section')
+    parser.add_argument('--where', default='true', help='Where filter of the router footprint section')
+    parser.add_argument('--tab-size', type=int, default=2, help='Yaml indentation')
+    parser.add_argument('--no-place-nets', action='store_true', help="Don't place nets in routes")
+    parser.add_argument('--include-locked', action='store_true', help='Include locked tracks and vias')
+    parser.add_argument('--compact', action='store_true', help='Output compact routes')
+    parser.add_argument('--cleanup', action='store_true', help='Skip duplicate vias/tracks and merge overlapping colinear tracks')
+    parser.add_argument('--mirror', action='store_true',
+                        help='Share a single block between reference footprints and their mirrored counterparts, which must match --footprints')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='ergogen', description='Ergogen KiCad plugin command line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = subparsers.add_parser('replay', help='Run route generation on a recorded selection snapshot')
+    replay_parser.add_argument('snapshot', help='Snapshot file recorded from the plugin window (.jsonl or .jsonl.gz)')
+    replay_parser.add_argument('--repeat', type=int, default=1, help='Number of times to run generation, for benchmarking')
+    replay_parser.add_argument('--profile', action='store_true', help='Print cProfile statistics to stderr')
+    replay_parser.set_defaults(func=replay_command)
+
+    extract_parser = subparsers.add_parser('extract', help='Generate routes from a board file')
+    add_extract_arguments(extract_parser)
+    extract_parser.add_argument('--output', help='Output file, printed to stdout if not given')
+    extract_parser.set_defaults(func=extract_command)
+
+    watch_parser = subparsers.add_parser('watch', help='Regenerate routes whenever a board file is saved')
+    add_extract_arguments(watch_parser)
+    watch_parser.add_argument('--output', required=True, help='Output file, rewritten only when the routes change')
+    watch_parser.add_argument('--interval', type=float, default=0.5, help='Polling interval in seconds')
+    watch_parser.add_argument('--budget', type=float, default=2.0, help='Latency budget in seconds, slower regenerations are reported')
+    watch_parser.set_defaults(func=watch_command)
+
+    batch_parser = subparsers.add_parser('batch', help='Generate routes of several boards in parallel')
+    batch_parser.add_argument('batch', help='Batch file (JSON) listing the boards and their options, see batch.py')
+    batch_parser.add_argument('--workers', type=int, help='Number of worker processes (default: number of CPUs)')
+    batch_parser.add_argument('--cache', default='.ergogen_cache', help='Results cache folder, shared by the workers and between runs')
+    batch_parser.add_argument('--no-cache', action='store_true', help="Don't use the results cache")
+    batch_parser.add_argument('--report', help='Write a JSON report with per board status and timings')
+    batch_parser.set_defaults(func=batch_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
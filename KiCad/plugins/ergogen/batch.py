@@ -0,0 +1,160 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Union
+import hashlib
+import json
+import os
+import pathlib
+import time
+from .headless import ExtractOptions, extract, write_if_changed
+from .helper import get_logger
+logger = get_logger(__name__)
+
+# Batch extraction - regenerates the router blocks of many boards, each board in its own worker process.
+#
+# The batch file is JSON, options given in "defaults" apply to every board and can be overridden per board:
+#   {"defaults": {"footprints": ["SW*", "D*"], "ref_fp_name": "SW1", "fp_sec_name": "key_routes"},
+#    "boards": [{"board": "variant_a.kicad_pcb", "output": "variant_a_routes.yaml"},
+#               {"board": "variant_b.kicad_pcb", "ref_fp_name": "SW2"}]}
+# Besides "board", "output" (defaults to <board>.routes.yaml) and "footprints" (reference patterns, defaults to the
+# reference footprints), options are the keyword arguments of RouterGen.get_selection_router_config, with the same
+# defaults as the extract command. Paths are relative to the batch file.
+#
+# Results are cached on disk by board file content, options and the content of the diff_config_path file if given, so
+# unchanged boards are skipped on the next run.
+
+CACHE_VERSION = 1
+BATCH_ONLY_KEYS = ('board', 'output', 'footprints')
+
+
+class BoardJob:
+    board: str
+    output: str
+    options: ExtractOptions
+
+    def __init__(self, board: str, output: str, options: ExtractOptions):
+        self.board = board
+        self.output = output
+        self.options = options
+
+
+class BoardResult:
+    board: str
+    output: str
+    status: str  # 'generated', 'cached' or 'failed'
+    seconds: float
+    changed: bool  # output file was rewritten
+    error: str
+
+    def __init__(self, board: str, output: str):
+        self.board = board
+        self.output = output
+        self.status = 'failed'
+        self.seconds = 0.0
+        self.changed = False
+        self.error = ''
+
+    def to_json(self) -> dict[str, Any]:
+        return {'board': self.board, 'output': self.output, 'status': self.status, 'seconds': round(self.seconds, 4),
+                'changed': self.changed, 'error': self.error}
+
+
+def load_batch(path: str) -> list[BoardJob]:
+    with open(path, encoding='utf-8') as f:
+        batch = json.load(f)
+    base_dir = pathlib.Path(path).parent
+    defaults: dict[str, Any] = batch.get('defaults', {})
+    jobs: list[BoardJob] = []
+    for entry in batch['boards']:
+        options = {**defaults, **entry}
+        if 'board' not in options or 'ref_fp_name' not in options:
+            raise ValueError(f'Batch entry must have "board" and "ref_fp_name": {entry}')
+        board = str(base_dir.joinpath(options['board']))
+        output = str(base_dir.joinpath(options['output'])) if 'output' in options else str(pathlib.Path(board).with_suffix('.routes.yaml'))
+        router_config = {key: value for key, value in options.items() if key not in BATCH_ONLY_KEYS}
+        router_config.setdefault('nets_map', {})
+        router_config.setdefault('include_locked_tracks_vias', False)
+        if router_config.get('diff_config_path'):
+            router_config['diff_config_path'] = str(base_dir.joinpath(router_config['diff_config_path']))
+        footprints = options.get('footprints') or [router_config['ref_fp_name']] + router_config.get('extra_ref_fp_names', [])
+        jobs.append(BoardJob(board, output, ExtractOptions(footprints, router_config)))
+    return jobs
+
+
+def cache_key(job: BoardJob) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CACHE_VERSION, job.options.footprints, job.options.router_config], sort_keys=True).encode('utf-8'))
+    paths = [job.board]
+    if job.options.router_config.get('diff_config_path'):
+        paths.append(job.options.router_config['diff_config_path'])  # output is a diff against it
+    for path in paths:
+        digest.update(b'\0')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_job(job: BoardJob, cache_dir: Union[str, None]) -> BoardResult:
+    # Runs in a worker process, loads the board itself
+    result = BoardResult(job.board, job.output)
+    start_time = time.perf_counter()
+    try:
+        cache_path: Union[pathlib.Path, None] = None
+        yaml: Union[str, None] = None
+        if cache_dir is not None:
+            cache_path = pathlib.Path(cache_dir).joinpath(f'{cache_key(job)}.yaml')
+            if cache_path.exists():
+                yaml = cache_path.read_text(encoding='utf-8')
+                result.status = 'cached'
+        if yaml is None:
+            yaml, _ = extract(job.board, job.options)
+            result.status = 'generated'
+            if cache_path is not None:
+                # Several workers may write the same entry, each write is atomic and they are identical
+                tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+                tmp_path.write_text(yaml, encoding='utf-8')
+                os.replace(tmp_path, cache_path)
+        result.changed = write_if_changed(job.output, yaml)
+    except Exception as e:
+        logger.exception(f'Batch extraction of {job.board} failed')
+        result.status = 'failed'
+        result.error = f'{type(e).__name__}: {e}'
+    result.seconds = time.perf_counter() - start_time
+    return result
+
+
+def run_batch(jobs: list[BoardJob], workers: Union[int, None] = None, cache_dir: Union[str, None] = None) -> list[BoardResult]:
+    # Results are returned in jobs order
+    if cache_dir is not None:
+        pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    results: dict[int, BoardResult] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, job, cache_dir): idx for idx, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:  # worker died (e.g. crashed inside pcbnew)
+                results[idx] = BoardResult(jobs[idx].board, jobs[idx].output)
+                results[idx].error = f'{type(e).__name__}: {e}'
+    return [results[idx] for idx in range(len(jobs))]
+
+
+def summary(results: list[BoardResult], elapsed: float) -> list[str]:
+    lines = []
+    for result in results:
+        line = f'{result.status:9} {result.seconds:8.3f}s  {result.board}'
+        if result.status != 'failed':
+            line += f' -> {result.output}{"" if result.changed else " (unchanged)"}'
+        else:
+            line += f'  {result.error}'
+        lines.append(line)
+    counts = {status: sum(1 for result in results if result.status == status) for status in ('generated', 'cached', 'failed')}
+    lines.append(f'{len(results)} boards in {elapsed:.3f}s: {counts["generated"]} generated, {counts["cached"]} cached, {counts["failed"]} failed, '
+                 f'{sum(result.seconds for result in results):.3f}s total worker time')
+    return lines
+
+
+def write_report(path: str, results: list[BoardResult], elapsed: float):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'elapsed': round(elapsed, 4), 'boards': [result.to_json() for result in results]}, f, indent=2)
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Union
+from .route_parser import compact_route_tokens, expand_tokens, split_route_comment, tokenize_route, tokens_to_route
+from .router_config import RouterBlock
+
+# Diff of generated routes against the routes of an existing router block, so only what actually changed needs to be
+# updated in the Ergogen config. Routes are compared by geometry rather than by text: a route is canonicalized into its
+# rounded, sorted segments (with unordered endpoints) and vias, so the same tracks written in a different order,
+# direction or with slightly different rounding compare equal.
+
+RouteKey = tuple[tuple, tuple, tuple]
+
+DEFAULT_DECIMALS = 3  # 1um, well above the rounding differences between generations
+
+
+def canonical_route_key(route: str, decimals: int = DEFAULT_DECIMALS) -> RouteKey:
+    expanded = expand_tokens(tokenize_route(route), route)
+
+    def canonical_pos(pos: tuple[float, float]) -> tuple[float, float]:
+        # + 0.0 turns -0.0 into 0.0
+        return (round(pos[0], decimals) + 0.0, round(pos[1], decimals) + 0.0)
+
+    segments = []
+    for segment in expanded.segments:
+        start = canonical_pos(segment.start)
+        end = canonical_pos(segment.end)
+        mid = () if segment.mid is None else canonical_pos(segment.mid)  # () keeps segments sortable next to arcs
+        segments.append((min(start, end), max(start, end), segment.layer, mid))
+    vias = [canonical_pos(via.pos) for via in expanded.vias]
+    nets = set(segment.net.lstrip('!') for segment in expanded.segments if segment.net)
+    nets.update(via.net.lstrip('!') for via in expanded.vias if via.net)
+    return (tuple(sorted(segments)), tuple(sorted(vias)), tuple(sorted(nets)))
+
+
+def block_route_lines(block: RouterBlock) -> list[str]:
+    # All routes of the block as yaml route lines, compact routes are converted back to route strings
+    lines = list(block.routes)
+    for compact in block.compact_routes:
+        lines.append(f'"{tokens_to_route(compact_route_tokens(compact))}"')
+    return lines
+
+
+class RoutesDiff:
+    unchanged: list[str]
+    added: list[str]
+    removed: list[str]
+    changed: list[tuple[str, str]]  # (existing, generated)
+    merged: list[str]  # existing routes with the changes applied, in existing order followed by added routes
+
+    def __init__(self):
+        self.unchanged = []
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.merged = []
+
+    def has_changes(self) -> bool:
+        return len(self.added) != 0 or len(self.removed) != 0 or len(self.changed) != 0
+
+    def summary(self) -> list[str]:
+        lines = [f'{len(self.unchanged)} unchanged, {len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed']
+        if len(self.removed) != 0:
+            lines.append('removed:')
+            lines.extend(f'  - {route}' for route in self.removed)
+        if len(self.changed) != 0:
+            lines.append('changed:')
+            for existing, generated in self.changed:
+                lines.append(f'  - {existing}')
+                lines.append(f'    -> {generated}')
+        if len(self.added) != 0:
+            lines.append('added:')
+            lines.extend(f'  - {route}' for route in self.added)
+        return lines
+
+
+def diff_router_routes(existing: list[str], generated: list[str], decimals: int = DEFAULT_DECIMALS) -> RoutesDiff:
+    diff = RoutesDiff()
+    existing_keys = [canonical_route_key(split_route_comment(route)[0], decimals) for route in existing]
+    generated_keys = [canonical_route_key(split_route_comment(route)[0], decimals) for route in generated]
+
+    # Exact (canonical) matches first, as a multiset so duplicated routes are accounted for
+    generated_by_key: dict[RouteKey, list[int]] = defaultdict(list)
+    for idx, key in enumerate(generated_keys):
+        generated_by_key[key].append(idx)
+    matched_generated: set[int] = set()
+    unmatched_existing: list[int] = []
+    replacements: dict[int, Union[int, None]] = {}  # existing idx -> generated idx replacing it (None if removed)
+    for idx, key in enumerate(existing_keys):
+        if len(generated_by_key[key]) != 0:
+            matched_generated.add(generated_by_key[key].pop(0))
+            diff.unchanged.append(existing[idx])
+        else:
+            unmatched_existing.append(idx)
+    unmatched_generated = [idx for idx in range(len(generated)) if idx not in matched_generated]
+
+    # Remaining routes sharing geometry (a segment, a segment endpoint or a via) are considered changed, pairing the largest overlaps first
+    def features(key: RouteKey) -> set:
+        endpoints = set(('point', segment[0], segment[2]) for segment in key[0]) | set(('point', segment[1], segment[2]) for segment in key[0])
+        return set(key[0]) | endpoints | set(('via', via) for via in key[1])
+
+    generated_by_feature: dict[object, list[int]] = defaultdict(list)
+    for idx in unmatched_generated:
+        for feature in features(generated_keys[idx]):
+            generated_by_feature[feature].append(idx)
+    candidates: list[tuple[int, int, int]] = []
+    for existing_idx in unmatched_existing:
+        overlaps: dict[int, int] = defaultdict(int)
+        for feature in features(existing_keys[existing_idx]):
+            for generated_idx in generated_by_feature.get(feature, []):
+                overlaps[generated_idx] += 1
+        candidates.extend((-count, existing_idx, generated_idx) for generated_idx, count in overlaps.items())
+    paired_existing: set[int] = set()
+    paired_generated: set[int] = set()
+    for _, existing_idx, generated_idx in sorted(candidates):
+        if existing_idx in paired_existing or generated_idx in paired_generated:
+            continue
+        paired_existing.add(existing_idx)
+        paired_generated.add(generated_idx)
+        replacements[existing_idx] = generated_idx
+    diff.changed = [(existing[idx], generated[replacements[idx]]) for idx in sorted(paired_existing)]  # type: ignore
+
+    for idx in unmatched_existing:
+        if idx not in paired_existing:
+            replacements[idx] = None
+            diff.removed.append(existing[idx])
+    diff.added = [generated[idx] for idx in unmatched_generated if idx not in paired_generated]
+
+    for idx, route in enumerate(existing):
+        if idx not in replacements:
+            diff.merged.append(route)
+        elif replacements[idx] is not None:
+            diff.merged.append(generated[replacements[idx]])  # type: ignore
+    diff.merged.extend(diff.added)
+    return diff
@@ -1,6 +1,14 @@
 import wx
 import random
+import time
+from typing import Union
+import pcbnew
 from .router_gen import RouterGen, SelectionAnalysis
+from .route_library import RouteLibrary, RouteTemplate
+from .route_parser import RouteParseError
+from .router_config import parse_router_blocks
+from .config_diff import block_route_lines
+from .snapshot import record_selection_router_config
 
 
 from .helper import get_logger
@@ -10,12 +18,16 @@ logger = get_logger(__name__)
 INSTRUCTIONS = '''Instructions
 ------------
 1. Select at least one footpring and optionally routes/vias
-2. Press Analyze Selection
+2. Check the Selection Analysis (updated live, or press Analyze Selection)
 3. Fill your choices in Route Specification Selection
 4. Press Generate Routes Button
 5. Check results and if satisfied, copy to clipboard and paste in your ErgoGen config file
 '''
 
+SELECTION_POLL_MS = 250  # how often the selection is checked for changes by live analysis
+SELECTION_DEBOUNCE_S = 0.3  # selection must stay unchanged this long before the analysis is updated
+SELECTION_FULL_CHECK_S = 2.0  # how often the whole selection is compared even when its signature didn't change
+
 class ErgogenFrame(wx.Frame):
 
     ontop: bool
@@ -26,26 +38,60 @@ class ErgogenFrame(wx.Frame):
     info_vias: wx.StaticText
     info_nets: wx.StaticText
     info_unsupported: wx.StaticText
+    info_library: wx.StaticText
+    live_analysis: wx.CheckBox
+    sel_analysis: SelectionAnalysis
+    selection_timer: wx.Timer
+    analyzed_selection: frozenset[str]  # uuids of the selection sel_analysis reflects
+    pending_selection: Union[frozenset[str], None]  # changed selection waiting to settle
+    pending_since: float
+    selection_signature: tuple  # cheap signature of the selection at the last check, see get_selection_signature
+    full_check_time: float  # when the whole selection was last compared
+
+    tools_net_filter: wx.TextCtrl
+    tools_layer_filter: wx.Choice
+    tools_region_filter: wx.CheckBox
 
     collect_fp_tracks: wx.CheckBox
     include_selected_tracks: wx.CheckBox
     include_locked_tracks_vias: wx.CheckBox
+    cleanup_tracks: wx.CheckBox
+    mirror_routes: wx.CheckBox
     ref_fp: wx.ComboBox
+    extra_ref_fps: wx.TextCtrl
     place_nets: wx.CheckBox
     nets_sz: wx.FlexGridSizer
     nets_win: wx.ScrolledWindow
     nets: dict[str, wx.ComboBox]
+    nets_labels: dict[str, wx.StaticText]
 
     tab_size: wx.SpinCtrl
     fp_sec_name: wx.TextCtrl
     filter: wx.TextCtrl
+    verify_routes: wx.CheckBox
+    compact_routes: wx.CheckBox
+    diff_config: wx.FilePickerCtrl
+    diff_full_blocks: wx.CheckBox
 
     yaml_txt: wx.TextCtrl
+    applied_uuids: list[str]  # items applied by Apply Routes, by uuid as the user may delete them meanwhile
+    route_library: RouteLibrary
+    library_template: Union[RouteTemplate, None]  # library match of the selected footprints arrangement
 
     def __init__(self):
         pcbnew_frame = wx.FindWindowByName("PcbFrame")
         super().__init__(pcbnew_frame)
         self.nets = {}
+        self.nets_labels = {}
+        self.applied_uuids = []
+        self.route_library = RouteLibrary()
+        self.library_template = None
+        self.sel_analysis = SelectionAnalysis()
+        self.analyzed_selection = frozenset()
+        self.pending_selection = None
+        self.pending_since = 0
+        self.selection_signature = ()
+        self.full_check_time = 0
         self.ontop = False
         self.init_ui()
 
@@ -53,6 +99,11 @@ class ErgogenFrame(wx.Frame):
         pcbnew_frame.Bind(wx.EVT_ACTIVATE, self.OnParentActivate)
         self.Bind(wx.EVT_ACTIVATE, self.OnSelfActivate)
 
+        # KiCad has no selection change notifications for python plugins, so the selection is polled
+        self.selection_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnSelectionTimer, self.selection_timer)
+        self.selection_timer.Start(SELECTION_POLL_MS)
+
     def OnParentActivate(self, evt):
         if not self.ontop:
             return
@@ -110,6 +161,9 @@ class ErgogenFrame(wx.Frame):
         analyze_btn = wx.Button(sbl, wx.ID_ANY, label="Analyze Selection")
         analyze_btn.Bind(wx.EVT_BUTTON, self.OnAnalyze)
         sel_analysis_sz.Add(analyze_btn, flag=wx.EXPAND)
+        self.live_analysis = wx.CheckBox(sbl, label="Live update on selection changes")
+        self.live_analysis.SetValue(True)
+        sel_analysis_sz.Add(self.live_analysis, flag=wx.TOP, border=5)
 
         info_sz = wx.FlexGridSizer(2, 5, 5)
         self.info_footprints = wx.StaticText(sbl, label="?")
@@ -117,12 +171,14 @@ class ErgogenFrame(wx.Frame):
         self.info_vias = wx.StaticText(sbl, label="?")
         self.info_nets = wx.StaticText(sbl, label="?")
         self.info_unsupported = wx.StaticText(sbl, label="?")
+        self.info_library = wx.StaticText(sbl, label="?")
 
         info_sz.AddMany([wx.StaticText(sbl, label="Footprints:"), self.info_footprints,
                          wx.StaticText(sbl, label="Tracks:"), self.info_tracks,
                          wx.StaticText(sbl, label="Vias:"), self.info_vias,
                          wx.StaticText(sbl, label="Nets:"), self.info_nets,
-                         wx.StaticText(sbl, label="Unsupported:"), self.info_unsupported
+                         wx.StaticText(sbl, label="Unsupported:"), self.info_unsupported,
+                         wx.StaticText(sbl, label="Library:"), self.info_library
                          ])
         sel_analysis_sz.Add(info_sz, flag=wx.ALL, border=10)
 
@@ -142,6 +198,18 @@ class ErgogenFrame(wx.Frame):
         sel_tools_sz.Add(select_connected_footprints_btn, flag= wx.TOP | wx.EXPAND, border=10)
         sel_tools_sz.Add(select_all_footprints_btn, flag= wx.TOP | wx.EXPAND, border=10)
 
+        tools_filter_sz = wx.FlexGridSizer(2, 5, 5)
+        self.tools_net_filter = wx.TextCtrl(sbr, value="")
+        self.tools_net_filter.SetToolTip("Limit tools to nets matching this pattern (e.g. 'col*'), empty for all nets")
+        self.tools_layer_filter = wx.Choice(sbr, choices=["All", "F.Cu", "B.Cu"])
+        self.tools_layer_filter.SetSelection(0)
+        tools_filter_sz.AddMany([(wx.StaticText(sbr, label="Net:"), 0, wx.ALIGN_CENTER_VERTICAL), (self.tools_net_filter, 1, wx.EXPAND),
+                                 (wx.StaticText(sbr, label="Layer:"), 0, wx.ALIGN_CENTER_VERTICAL), (self.tools_layer_filter, 1, wx.EXPAND)])
+        tools_filter_sz.AddGrowableCol(1)
+        sel_tools_sz.Add(tools_filter_sz, flag=wx.TOP | wx.EXPAND, border=10)
+        self.tools_region_filter = wx.CheckBox(sbr, label="Only within selected footprints area")
+        sel_tools_sz.Add(self.tools_region_filter, flag=wx.TOP, border=5)
+
         hsizer = wx.BoxSizer(wx.HORIZONTAL)
         hsizer.Add(sel_analysis_sz, proportion=1, flag=wx.EXPAND)
         hsizer.Add(sel_tools_sz, proportion=0, flag=wx.LEFT | wx.EXPAND, border=10)
@@ -165,10 +233,27 @@ class ErgogenFrame(wx.Frame):
         route_spec_sz.Add(self.include_locked_tracks_vias, flag=wx.LEFT, border=10)
         route_spec_sz.AddSpacer(5)
 
+        self.cleanup_tracks = wx.CheckBox(sb, label="Skip duplicate vias/tracks and merge overlapping tracks (board isn't changed)")
+        self.cleanup_tracks.SetValue(False)
+        route_spec_sz.Add(self.cleanup_tracks, flag=wx.LEFT, border=10)
+        route_spec_sz.AddSpacer(5)
+
+        self.mirror_routes = wx.CheckBox(sb, label="Share routes with mirrored counterparts of reference footprints (split boards)")
+        self.mirror_routes.SetToolTip("Reference footprints and their mirrored counterparts in the selection get a single block, "
+                                      "mirrored by router.js on Ergogen mirrored points")
+        route_spec_sz.Add(self.mirror_routes, flag=wx.LEFT, border=10)
+        route_spec_sz.AddSpacer(5)
+
         combo_sz = wx.BoxSizer(wx.HORIZONTAL)
         ref_fp_label = wx.StaticText(sb, label="Reference footprint")
         self.ref_fp = wx.ComboBox(sb, style=wx.CB_READONLY)
-        combo_sz.AddMany([ref_fp_label, (self.ref_fp, 0, wx.EXPAND | wx.LEFT, 5)])
+        self.ref_fp.Bind(wx.EVT_COMBOBOX, self.OnRefFpChanged)
+        extra_ref_fps_label = wx.StaticText(sb, label="Additional references:")
+        self.extra_ref_fps = wx.TextCtrl(sb, value="")
+        self.extra_ref_fps.SetToolTip("Comma separated footprint references, tracks are split to the nearest reference and a router block is generated per reference, "
+                                      "with a <where_REFERENCE> filter placeholder to fill in")
+        combo_sz.AddMany([ref_fp_label, (self.ref_fp, 0, wx.EXPAND | wx.LEFT, 5),
+                          (extra_ref_fps_label, 0, wx.CENTER | wx.LEFT, 10), (self.extra_ref_fps, 1, wx.EXPAND | wx.LEFT, 5)])
         route_spec_sz.Add(combo_sz, 0, flag=wx.EXPAND | wx.LEFT, border=10)
         route_spec_sz.AddSpacer(5)
 
@@ -202,6 +287,23 @@ class ErgogenFrame(wx.Frame):
                                         ])
         route_spec_sz.AddSpacer(5)
         route_spec_sz.Add(routes_placeholders_sz, 0, wx.EXPAND, border=10)
+        route_spec_sz.AddSpacer(5)
+
+        self.compact_routes = wx.CheckBox(sb, label="Compact pre-parsed routes format (faster Ergogen builds, requires router footprint 1.2+)")
+        self.compact_routes.SetValue(False)
+        route_spec_sz.Add(self.compact_routes, flag=wx.LEFT, border=10)
+        route_spec_sz.AddSpacer(5)
+
+        diff_config_sz = wx.BoxSizer(wx.HORIZONTAL)
+        diff_config_label = wx.StaticText(sb, label="Diff against config file:")
+        self.diff_config = wx.FilePickerCtrl(sb, message="Select Ergogen config file", wildcard="Ergogen config (*.yaml;*.yml)|*.yaml;*.yml|All files|*",
+                                             style=wx.FLP_OPEN | wx.FLP_FILE_MUST_EXIST | wx.FLP_USE_TEXTCTRL)
+        self.diff_config.SetToolTip("Optional, when set only changes against the router blocks of the same name in this config file are output")
+        self.diff_full_blocks = wx.CheckBox(sb, label="Full updated blocks")
+        self.diff_full_blocks.SetToolTip("Output the whole updated blocks instead of only the routes to add")
+        diff_config_sz.AddMany([(diff_config_label, 0, wx.CENTER | wx.LEFT, 10), (self.diff_config, 1, wx.EXPAND | wx.LEFT, 5),
+                                (self.diff_full_blocks, 0, wx.CENTER | wx.LEFT, 10)])
+        route_spec_sz.Add(diff_config_sz, 0, wx.EXPAND)
 
         self.main_sz.Add(route_spec_sz, 0, flag=wx.ALL | wx.EXPAND, border=10)
 
@@ -209,15 +311,22 @@ class ErgogenFrame(wx.Frame):
         for w in self.nets_sz.GetChildren():
             w.GetWindow().Destroy()
         self.nets.clear()
+        self.nets_labels.clear()
 
     def set_nets(self, nets_list: set[str]):
-        self.clear_nets()
+        # Only nets that come or go are touched, so mappings already edited for the remaining nets are kept
+        for net in [net for net in self.nets if net not in nets_list]:
+            self.nets_labels.pop(net).Destroy()
+            self.nets.pop(net).Destroy()
         for net in nets_list:
+            if net in self.nets:
+                continue
             st = wx.StaticText(self.nets_win, label=f'"{net}" : ', style=wx.ALIGN_RIGHT)
             cb = wx.ComboBox(self.nets_win, value=net, choices=[net, '{{colrow}}', '{{column_net}}', '{{row_net}}'])
             self.nets_sz.Add(st, flag=wx.EXPAND | wx.CENTER | wx.TOP, border=3)
             self.nets_sz.Add(cb)
             self.nets[net] = cb
+            self.nets_labels[net] = st
         self.nets_win.Layout()
         self.nets_win.FitInside()
 
@@ -234,6 +343,30 @@ class ErgogenFrame(wx.Frame):
         exec_btn = wx.Button(sb, label="Generate Routes")
         execution_sz.Add(exec_btn, flag=wx.EXPAND)
         exec_btn.Bind(wx.EVT_BUTTON, self.OnGenRoute)
+        snapshot_btn = wx.Button(sb, label="Generate Routes and Save Selection Snapshot...")
+        execution_sz.Add(snapshot_btn, flag=wx.TOP | wx.EXPAND, border=5)
+        snapshot_btn.Bind(wx.EVT_BUTTON, self.OnSaveSnapshot)
+        self.verify_routes = wx.CheckBox(sb, label="Verify routes reproduce the source tracks/vias (adds result as yaml comment)")
+        self.verify_routes.SetValue(False)
+        execution_sz.Add(self.verify_routes, flag=wx.TOP, border=5)
+
+        apply_sz = wx.BoxSizer(wx.HORIZONTAL)
+        apply_btn = wx.Button(sb, label="Apply Yaml Routes to Selected Footprints")
+        apply_btn.Bind(wx.EVT_BUTTON, self.OnApplyRoutes)
+        remove_applied_btn = wx.Button(sb, label="Remove Applied Routes")
+        remove_applied_btn.Bind(wx.EVT_BUTTON, self.OnRemoveAppliedRoutes)
+        apply_sz.Add(apply_btn, 1, flag=wx.EXPAND)
+        apply_sz.Add(remove_applied_btn, 0, flag=wx.LEFT, border=5)
+        execution_sz.Add(apply_sz, flag=wx.TOP | wx.EXPAND, border=5)
+
+        library_sz = wx.BoxSizer(wx.HORIZONTAL)
+        save_library_btn = wx.Button(sb, label="Save Yaml Routes to Library")
+        save_library_btn.Bind(wx.EVT_BUTTON, self.OnSaveToLibrary)
+        insert_library_btn = wx.Button(sb, label="Insert Library Routes")
+        insert_library_btn.Bind(wx.EVT_BUTTON, self.OnInsertLibraryRoutes)
+        library_sz.Add(save_library_btn, 1, flag=wx.EXPAND)
+        library_sz.Add(insert_library_btn, 1, flag=wx.LEFT | wx.EXPAND, border=5)
+        execution_sz.Add(library_sz, flag=wx.TOP | wx.EXPAND, border=5)
 
         hsizer = wx.BoxSizer(wx.HORIZONTAL)
 
@@ -259,13 +392,19 @@ class ErgogenFrame(wx.Frame):
         self.main_sz.Add(execution_sz, 1, flag=wx.ALL | wx.EXPAND, border=10)
 
 
+    def get_tools_filters(self, router_gen: RouterGen) -> tuple[str, str, Union[pcbnew.BOX2I, None]]:
+        # Filters of the selection tools - net pattern, layer ('F'/'B' or '' for all) and region (None for the whole board)
+        layer = ['', 'F', 'B'][max(self.tools_layer_filter.GetSelection(), 0)]
+        region = router_gen.get_selection_region() if self.tools_region_filter.GetValue() else None
+        return self.tools_net_filter.GetValue().strip(), layer, region
+
     def OnLockTracksVias(self, event):  # pyright: ignore
         router_gen = RouterGen()
-        router_gen.lock_track_vias()
+        router_gen.lock_track_vias(*self.get_tools_filters(router_gen))
 
     def OnSelectUnlockedTracksVias(self, event):  # pyright: ignore
         router_gen = RouterGen()
-        router_gen.select_unlocked_tracks_vias()
+        router_gen.select_unlocked_tracks_vias(*self.get_tools_filters(router_gen))
         self.collect_fp_tracks.SetValue(False)
         self.include_selected_tracks.SetValue(True)
         self.include_locked_tracks_vias.SetValue(False)
@@ -278,13 +417,65 @@ class ErgogenFrame(wx.Frame):
 
     def OnSelectAllFootprints(self, event):  # pyright: ignore
         router_gen = RouterGen()
-        router_gen.select_all_footprints()
+        _, _, region = self.get_tools_filters(router_gen)
+        router_gen.select_all_footprints(region)
         self.collect_fp_tracks.SetValue(False)
         self.OnAnalyze(None)
 
     def OnAnalyze(self, event):  # pyright: ignore
-        router_gen = RouterGen()
-        sel_analysis: SelectionAnalysis = router_gen.get_selection_analysis()
+        # Full rescan, also picks up changes to already selected items (e.g. a track moved to another net)
+        current_selection = pcbnew.GetCurrentSelection()
+        selected = SelectionAnalysis.items_by_uuid(current_selection)
+        self.sel_analysis = SelectionAnalysis()
+        self.sel_analysis.update(selected)
+        self.analyzed_selection = frozenset(selected)
+        self.pending_selection = None
+        self.selection_signature = self.get_selection_signature(current_selection)
+        self.full_check_time = time.monotonic()
+        self.show_sel_analysis(True, True, True)
+
+    @staticmethod
+    def get_selection_signature(current_selection) -> tuple:
+        # Count and first/last items, cheap enough for every poll. Changes it misses (same count and same first/last items)
+        # are picked up by the periodic full check
+        count = len(current_selection)
+        if count == 0:
+            return (0,)
+        return (count, current_selection[0].m_Uuid.AsString(), current_selection[count - 1].m_Uuid.AsString())
+
+    def OnSelectionTimer(self, event):  # pyright: ignore
+        if not self.live_analysis.GetValue() or not self.IsShown():
+            return
+        current_selection = pcbnew.GetCurrentSelection()
+        signature = self.get_selection_signature(current_selection)
+        now = time.monotonic()
+        if self.pending_selection is None and signature == self.selection_signature and now - self.full_check_time < SELECTION_FULL_CHECK_S:
+            return
+        self.selection_signature = signature
+        self.full_check_time = now
+        selected = SelectionAnalysis.items_by_uuid(current_selection)
+        selection = frozenset(selected)
+        if selection == self.analyzed_selection:
+            self.pending_selection = None
+            return
+        # Debounce, wait for the selection to settle (e.g. while dragging a selection box)
+        if selection != self.pending_selection:
+            self.pending_selection = selection
+            self.pending_since = time.monotonic()
+            return
+        if time.monotonic() - self.pending_since < SELECTION_DEBOUNCE_S:
+            return
+        had_fps = self.sel_analysis.fp_count != 0
+        changed, nets_changed, fps_changed = self.sel_analysis.update(selected)
+        self.analyzed_selection = selection
+        self.pending_selection = None
+        if changed:
+            self.show_sel_analysis(nets_changed, fps_changed, not had_fps)
+
+    def show_sel_analysis(self, nets_changed: bool, fps_changed: bool, set_defaults: bool):
+        # set_defaults (the selection had no footprints before) resets the reference footprint and the track collection
+        # options to what suits the selection, otherwise the user's choices are kept
+        sel_analysis = self.sel_analysis
         self.info_footprints.SetLabelText(str(sel_analysis.fp_count) + ' ' + (str(sel_analysis.fps) if len(sel_analysis.fps) != 0 else ''))
         self.info_tracks.SetLabelText(str(sel_analysis.tracks_count))
         self.info_vias.SetLabelText(str(sel_analysis.vias_count))
@@ -297,27 +488,122 @@ class ErgogenFrame(wx.Frame):
                 else ""
             )
         )
-        self.info_nets.SetLabelText(str(len(sel_analysis.nets)) + ' ' + (str(sel_analysis.nets) if len(sel_analysis.nets) != 0 else ''))
-        self.set_nets(sel_analysis.nets)
-        self.ref_fp.Clear()
-        for fp in sel_analysis.fps:
-            self.ref_fp.Append(fp)
-        self.ref_fp.Value = sel_analysis.default_fp
-        if sel_analysis.tracks_count == 0 and sel_analysis.vias_count == 0 and sel_analysis.fp_count != 0:
+        if nets_changed:
+            self.info_nets.SetLabelText(str(len(sel_analysis.nets)) + ' ' + (str(sel_analysis.nets) if len(sel_analysis.nets) != 0 else ''))
+            self.set_nets(sel_analysis.nets)
+        if fps_changed:
+            ref_fp_name = self.ref_fp.GetValue()
+            self.ref_fp.Clear()
+            for fp in sel_analysis.fps:
+                self.ref_fp.Append(fp)
+            self.ref_fp.Value = sel_analysis.default_fp if set_defaults or ref_fp_name == '' else ref_fp_name
+            self.update_library_match()
+        if set_defaults and sel_analysis.tracks_count == 0 and sel_analysis.vias_count == 0 and sel_analysis.fp_count != 0:
             self.collect_fp_tracks.SetValue(True)
             self.include_selected_tracks.SetValue(False)
 
+    def OnRefFpChanged(self, event):  # pyright: ignore
+        self.update_library_match()
+
+    def update_library_match(self):
+        # Looks up the selected footprints arrangement in the route library, a single file check
+        self.library_template = None
+        key = RouterGen().get_selection_template_key(self.ref_fp.GetValue())
+        if key is not None:
+            self.library_template = self.route_library.lookup(key[0])
+        if self.library_template is not None:
+            self.info_library.SetLabelText(f'match "{self.library_template.name}" ({len(self.library_template.routes)} routes), see Insert Library Routes')
+        else:
+            self.info_library.SetLabelText('no match')
+
+    def OnSaveToLibrary(self, event):  # pyright: ignore
+        # Saves the router block in the yaml editor as the template of the selected footprints arrangement
+        blocks = parse_router_blocks(self.yaml_txt.GetValue())
+        if len(blocks) != 1:
+            wx.MessageBox("Yaml routes must contain exactly one router block to save to the library", "Route Library", wx.OK | wx.ICON_INFORMATION, self)
+            return
+        key = RouterGen().get_selection_template_key(self.ref_fp.GetValue())
+        if key is None:
+            wx.MessageBox("Select the reference footprint and the footprints the routes connect", "Route Library", wx.OK | wx.ICON_INFORMATION, self)
+            return
+        block = blocks[0]
+        path = self.route_library.save(RouteTemplate(key[0], block.name, key[1], block_route_lines(block)))
+        logger.info(f'Saved library routes to {path}')
+        self.update_library_match()
+
+    def OnInsertLibraryRoutes(self, event):  # pyright: ignore
+        if self.library_template is None:
+            wx.MessageBox("No library routes match the selected footprints", "Route Library", wx.OK | wx.ICON_INFORMATION, self)
+            return
+        self.yaml_txt.SetValue(RouterGen().get_routes_yaml(self.library_template.routes, self.tab_size.GetValue(), self.library_template.name,
+                                                           self.filter.GetValue(), self.compact_routes.GetValue()))
+
+    def get_router_config_options(self) -> dict:
+        # get_selection_router_config keyword arguments as set in the UI
+        return {'ref_fp_name': self.ref_fp.GetValue(),
+                'nets_map': self.get_nets_map(),
+                'footprint_tracks': self.collect_fp_tracks.GetValue(),
+                'selected_tracks_vias': self.include_selected_tracks.GetValue(),
+                'include_locked_tracks_vias': self.include_locked_tracks_vias.GetValue(),
+                'place_nets': self.place_nets.GetValue(),
+                'tab_size': self.tab_size.GetValue(),
+                'fp_sec_name': self.fp_sec_name.GetValue(),
+                'where_filter': self.filter.GetValue(),
+                'verify': self.verify_routes.GetValue(),
+                'compact': self.compact_routes.GetValue(),
+                'extra_ref_fp_names': [name.strip() for name in self.extra_ref_fps.GetValue().split(',') if name.strip() != ''],
+                'diff_config_path': self.diff_config.GetPath().strip(),
+                'diff_full_blocks': self.diff_full_blocks.GetValue(),
+                'cleanup': self.cleanup_tracks.GetValue(),
+                'mirror': self.mirror_routes.GetValue()}
+
     def OnGenRoute(self, event):  # pyright: ignore
         router_gen = RouterGen()
-        self.yaml_txt.SetValue(router_gen.get_selection_router_config(self.ref_fp.GetValue(),
-                                                                      self.get_nets_map(),
-                                                                      self.collect_fp_tracks.GetValue(),
-                                                                      self.include_selected_tracks.GetValue(),
-                                                                      self.include_locked_tracks_vias.GetValue(),
-                                                                      self.place_nets.GetValue(),
-                                                                      self.tab_size.GetValue(),
-                                                                      self.fp_sec_name.GetValue(),
-                                                                      self.filter.GetValue()))
+        self.yaml_txt.SetValue(router_gen.get_selection_router_config(**self.get_router_config_options()))
+
+    def OnSaveSnapshot(self, event):  # pyright: ignore
+        # Generates routes like OnGenRoute while recording the inputs, for offline reproduction with 'python -m ergogen replay'
+        with wx.FileDialog(self, "Save selection snapshot", defaultFile="ergogen_snapshot.jsonl.gz",
+                           wildcard="Snapshot files (*.jsonl.gz;*.jsonl)|*.jsonl.gz;*.jsonl", style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = dialog.GetPath()
+        router_gen = RouterGen()
+        self.yaml_txt.SetValue(record_selection_router_config(router_gen, path, **self.get_router_config_options()))
+
+    def OnApplyRoutes(self, event):  # pyright: ignore
+        # Preview the (possibly edited) yaml routes on the board, replacing whatever was applied before
+        router_gen = RouterGen()
+        footprints = router_gen.get_selected_footprints()
+        if len(footprints) == 0:
+            wx.MessageBox("Select the footprints to apply the routes on", "Apply Routes", wx.OK | wx.ICON_INFORMATION, self)
+            return
+        # One block at a time, as blocks are meant for different footprints (e.g. several reference footprints), select the block's lines
+        # in the editor to apply one of several
+        yaml = self.yaml_txt.GetStringSelection() or self.yaml_txt.GetValue()
+        try:
+            blocks = parse_router_blocks(yaml)
+        except (RouteParseError, ValueError) as e:  # ValueError covers malformed compact routes
+            wx.MessageBox(str(e), "Apply Routes", wx.OK | wx.ICON_ERROR, self)
+            return
+        if len(blocks) == 0:
+            wx.MessageBox("Yaml routes don't contain a router block to apply", "Apply Routes", wx.OK | wx.ICON_INFORMATION, self)
+            return
+        if len(blocks) > 1:
+            wx.MessageBox("Yaml routes contain several router blocks, select the lines of the one to apply", "Apply Routes",
+                          wx.OK | wx.ICON_INFORMATION, self)
+            return
+        start_time = time.perf_counter()
+        try:
+            self.applied_uuids = router_gen.apply_routes(blocks[0], footprints, self.applied_uuids)
+        except RouteParseError as e:
+            wx.MessageBox(str(e), "Apply Routes", wx.OK | wx.ICON_ERROR, self)
+            return
+        logger.info(f'Applied {len(self.applied_uuids)} tracks/vias in {time.perf_counter() - start_time:.3f}s')
+
+    def OnRemoveAppliedRoutes(self, event):  # pyright: ignore
+        RouterGen().remove_items(self.applied_uuids)
+        self.applied_uuids = []
 
     def OnClearYaml(self, event):  # pyright: ignore
         self.yaml_txt.SetValue(INSTRUCTIONS)
@@ -346,4 +632,5 @@ class ErgogenFrame(wx.Frame):
 
 
     def OnClose(self, event):
+        self.selection_timer.Stop()
         event.Skip()
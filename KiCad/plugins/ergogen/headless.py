@@ -0,0 +1,104 @@
+from typing import Any, Callable, Union
+import fnmatch
+import os
+import time
+import pcbnew
+from .router_gen import RouterGen
+from .helper import get_logger
+logger = get_logger(__name__)
+
+# Headless extraction - runs route generation on a .kicad_pcb file without the PCB Editor.
+# The role of the selection in the plugin window is taken by the footprints whose references match the given
+# patterns, and tracks are always collected through the footprints' pads.
+
+
+class ExtractOptions:
+    footprints: list[str]  # reference patterns (e.g. 'SW1', 'D*') of the footprints to collect tracks from
+    router_config: dict[str, Any]  # keyword arguments of RouterGen.get_selection_router_config
+
+    def __init__(self, footprints: list[str], router_config: dict[str, Any]):
+        self.footprints = footprints
+        self.router_config = router_config
+
+
+def load_board(board_path: str) -> pcbnew.BOARD:
+    board = pcbnew.LoadBoard(board_path)
+    board.BuildConnectivity()
+    return board
+
+
+def select_footprints(board: pcbnew.BOARD, patterns: list[str]) -> list[pcbnew.FOOTPRINT]:
+    footprints: list[pcbnew.FOOTPRINT] = []
+    fp: pcbnew.FOOTPRINT
+    for fp in board.GetFootprints():
+        ref = fp.GetReferenceAsString()
+        if any(fnmatch.fnmatchcase(ref, pattern) for pattern in patterns):
+            footprints.append(fp)
+    return footprints
+
+
+def extract(board_path: str, options: ExtractOptions, component_cache: Union[dict, None] = None) -> tuple[str, dict]:
+    # Returns the generated yaml and the component cache to pass to the next extraction of the same board
+    # Always goes through the component cache (empty on a first extraction), so routes come out in the same (sorted) order
+    # on every extraction, whether from watch, batch or a single extract
+    board = load_board(board_path)
+    router_gen = RouterGen(board=board, selection=select_footprints(board, options.footprints))  # pyright: ignore
+    router_gen.component_cache = {} if component_cache is None else component_cache
+    router_config = dict(options.router_config)
+    router_config['footprint_tracks'] = True
+    router_config['selected_tracks_vias'] = False
+    yaml = router_gen.get_selection_router_config(**router_config)
+    return yaml, router_gen.next_component_cache
+
+
+def write_if_changed(path: str, content: str) -> bool:
+    # Atomic replace, and only when content changed, so tools watching the output (e.g. Ergogen) aren't triggered needlessly
+    try:
+        with open(path, encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def file_signature(path: str) -> Union[tuple[int, int], None]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watch(board_path: str, options: ExtractOptions, output_path: str, interval: float = 0.5, budget: float = 2.0,
+          report: Callable[[str], None] = print, should_stop: Callable[[], bool] = lambda: False):
+    # Polls the board file and regenerates the routes yaml whenever it changes, reusing the routes of connected
+    # components that didn't change since the previous run. Runs until should_stop() returns True
+    last_signature: Union[tuple[int, int], None] = None
+    component_cache: dict = {}
+    while not should_stop():
+        signature = file_signature(board_path)
+        if signature is not None and signature != last_signature:
+            # KiCad may still be writing the file, wait for it to settle before reading
+            time.sleep(min(interval, 0.2))
+            settled_signature = file_signature(board_path)
+            if settled_signature != signature:
+                continue
+            start_time = time.perf_counter()
+            try:
+                yaml, component_cache = extract(board_path, options, component_cache)
+            except Exception as e:  # keep watching, the next save may fix it
+                logger.exception('Extraction failed')
+                report(f'Extraction failed: {e}')
+                last_signature = signature
+                continue
+            written = write_if_changed(output_path, yaml)
+            elapsed = time.perf_counter() - start_time
+            report(f'{"Updated" if written else "No changes to"} {output_path} in {elapsed:.3f}s ({len(component_cache)} components)'
+                   + (f', over the {budget:.3f}s budget' if elapsed > budget else ''))
+            last_signature = signature
+        time.sleep(interval)
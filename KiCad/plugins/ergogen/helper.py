@@ -1,7 +1,6 @@
 import logging
 import pathlib
 
-print(pathlib.Path(__file__).parent.resolve().parent.resolve())
 
 def get_logger(logger_name):
     logger = logging.getLogger(logger_name)
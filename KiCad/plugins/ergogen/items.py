@@ -0,0 +1,29 @@
+from typing import Any, Union
+
+# Stand-ins for the few pcbnew types the generator uses of items that aren't on a board (snapshot replay, cleaned up
+# tracks), and helpers working the same on pcbnew items and on those. No pcbnew import, so it's usable anywhere.
+
+
+class ItemList(list):
+    # Stands in for the swig vectors returned by connectivity queries
+    def size(self) -> int:
+        return len(self)
+
+
+class ItemUuid:
+    # Stands in for KIID
+    uuid: str
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+
+    def AsString(self) -> str:
+        return self.uuid
+
+
+def track_mid(track: Any) -> Union[tuple[int, int], None]:
+    # Mid point of arc tracks, None for straight ones
+    if track.GetTypeDesc() != 'Arc':
+        return None
+    mid = track.Cast().GetMid()
+    return (mid.x, mid.y)
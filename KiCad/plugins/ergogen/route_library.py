@@ -0,0 +1,100 @@
+from typing import Any, Union
+import hashlib
+import json
+import os
+import pathlib
+from .config_diff import canonical_route_key
+from .route_parser import split_route_comment
+from .helper import get_logger
+logger = get_logger(__name__)
+
+# Local library of route templates, so routes of footprint arrangements that repeat across projects (e.g. a switch and
+# its diode) are extracted once and reused.
+#
+# Templates are content addressed: the key is a hash of the footprint ids and pad positions of the footprints involved,
+# in the reference footprint's local coordinates. The same arrangement gets the same key on any board, whatever its
+# placement, rotation or net names, and a lookup is a single file check. Each template is a JSON file <key>.json:
+#   {"version": 1, "key": ..., "name": ..., "footprints": [fpids], "routes": [route lines]}
+
+LIBRARY_VERSION = 1
+LIBRARY_PATH_ENV = 'ERGOGEN_ROUTE_LIBRARY'
+DEFAULT_LIBRARY_PATH = pathlib.Path.home() / '.ergogen' / 'route_library'
+PAD_DECIMALS = 3  # 1um, pad positions of the same footprints always match well within that
+
+PadSignature = tuple[str, str, float, float]  # (footprint id, pad number, x, y) in reference footprint local mm
+
+
+def template_key(pads: list[PadSignature]) -> str:
+    canonical = sorted((fpid, number, round(x, PAD_DECIMALS) + 0.0, round(y, PAD_DECIMALS) + 0.0) for fpid, number, x, y in pads)
+    return hashlib.sha256(json.dumps(canonical, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def canonical_routes(routes: list[str]) -> list[str]:
+    # Same routes in the same order however they were generated or edited, exact duplicates dropped
+    keyed: dict[tuple, str] = {}
+    for route in routes:
+        keyed.setdefault(canonical_route_key(split_route_comment(route)[0]), route.strip())
+    return [keyed[key] for key in sorted(keyed)]
+
+
+class RouteTemplate:
+    key: str
+    name: str
+    footprints: list[str]  # footprint ids, informative
+    routes: list[str]
+
+    def __init__(self, key: str, name: str, footprints: list[str], routes: list[str]):
+        self.key = key
+        self.name = name
+        self.footprints = footprints
+        self.routes = routes
+
+    def to_json(self) -> dict[str, Any]:
+        return {'version': LIBRARY_VERSION, 'key': self.key, 'name': self.name, 'footprints': self.footprints, 'routes': self.routes}
+
+    @staticmethod
+    def from_json(data: dict[str, Any]) -> 'RouteTemplate':
+        if data.get('version') != LIBRARY_VERSION:
+            raise ValueError(f'Unsupported route template version {data.get("version")}')
+        return RouteTemplate(data['key'], data.get('name', ''), data.get('footprints', []), data['routes'])
+
+
+class RouteLibrary:
+    path: pathlib.Path
+    templates: dict[str, RouteTemplate]  # loaded templates, misses aren't kept so templates saved meanwhile elsewhere are found
+
+    def __init__(self, path: Union[str, pathlib.Path, None] = None):
+        if path is None:
+            path = os.environ.get(LIBRARY_PATH_ENV, DEFAULT_LIBRARY_PATH)
+        self.path = pathlib.Path(path)
+        self.templates = {}
+
+    def template_path(self, key: str) -> pathlib.Path:
+        return self.path.joinpath(f'{key}.json')
+
+    def lookup(self, key: str) -> Union[RouteTemplate, None]:
+        if key in self.templates:
+            return self.templates[key]
+        try:
+            with open(self.template_path(key), encoding='utf-8') as f:
+                template = RouteTemplate.from_json(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            logger.exception(f'Failed reading route template {key}')
+            return None
+        self.templates[key] = template
+        return template
+
+    def save(self, template: RouteTemplate) -> pathlib.Path:
+        # Replaces a template saved before under the same key
+        template.routes = canonical_routes(template.routes)
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self.template_path(template.key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(template.to_json(), f, indent=2)
+        os.replace(tmp_path, path)
+        self.templates[template.key] = template
+        logger.info(f'Saved route template {template.name} ({len(template.routes)} routes) to {path}')
+        return path
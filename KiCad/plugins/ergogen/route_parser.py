@@ -0,0 +1,298 @@
+from typing import Union
+import math
+
+# Python implementation of the route grammar understood by footprints/router.js
+# Keep the two in sync, anything accepted here should expand exactly like router.js expands it:
+#   f / b       - set layer
+#   v           - place a via at current position and switch layer
+#   x / |       - start a new route (layer stays)
+#   (x,y)       - move to position, drawing a segment from the previous position if there is one
+#   a(x,y)      - arc mid point, the position that follows draws an arc passing through it instead of a straight segment
+#   <net>       - switch net, also starts a new route (router.js falls through to 'x')
+
+
+class RouteParseError(Exception):
+    pass
+
+
+class RouteSegment:
+    start: tuple[float, float]
+    end: tuple[float, float]
+    layer: str
+    net: Union[str, None]
+    mid: Union[tuple[float, float], None]  # set for arcs
+
+    def __init__(self, start: tuple[float, float], end: tuple[float, float], layer: str, net: Union[str, None],
+                 mid: Union[tuple[float, float], None] = None):
+        self.start = start
+        self.end = end
+        self.layer = layer
+        self.net = net
+        self.mid = mid
+
+    def __repr__(self):
+        return f'RouteSegment({self.start}->{self.end}{"" if self.mid is None else f" via {self.mid}"}, {self.layer}, {self.net})'
+
+
+class RouteVia:
+    pos: tuple[float, float]
+    net: Union[str, None]
+
+    def __init__(self, pos: tuple[float, float], net: Union[str, None]):
+        self.pos = pos
+        self.net = net
+
+    def __repr__(self):
+        return f'RouteVia({self.pos}, {self.net})'
+
+
+class ExpandedRoute:
+    segments: list[RouteSegment]
+    vias: list[RouteVia]
+
+    def __init__(self):
+        self.segments = []
+        self.vias = []
+
+
+def split_route_comment(line: str) -> tuple[str, str]:
+    # Routes are emitted as yaml list items, possibly quoted and with a trailing '# net: ...' remark
+    # Returns the bare route and the remark (without '#', empty if there is none)
+    route = line.strip()
+    if route.startswith('- '):
+        route = route[2:].strip()
+    comment = ''
+    if route.startswith('"') or route.startswith("'"):
+        closing = route.find(route[0], 1)
+        if closing == -1:
+            raise RouteParseError(f'Unclosed quote in route {line}')
+        rest = route[closing + 1:].strip()
+        if rest.startswith('#'):
+            comment = rest[1:].strip()
+        return route[1:closing], comment
+    comment_idx = route.find('#')
+    if comment_idx != -1:
+        comment = route[comment_idx + 1:].strip()
+        route = route[:comment_idx]
+    return route.strip(), comment
+
+
+def strip_route(line: str) -> str:
+    return split_route_comment(line)[0]
+
+
+def parse_position(route: str, i: int) -> tuple[tuple[float, float], int]:
+    # Parses the '(x,y)' starting at route[i], returns the position and the index of the closing parenthesis
+    closing = route.find(')', i)
+    if closing == -1:
+        raise RouteParseError(f'Unclosed position parenthesis in {route} at character position {i}')
+    parts = route[i + 1:closing].split(',')
+    try:
+        if len(parts) != 2:
+            raise ValueError()
+        pos = (float(parts[0]), float(parts[1]))
+    except ValueError:
+        raise RouteParseError(f'Invalid position encountered: {route[i:closing + 1]}')
+    return pos, closing
+
+
+def tokenize_route(route: str) -> list[tuple[str, Union[tuple[float, float], str, None]]]:
+    # Returns a list of (command, argument), command is one of 'f', 'b', 'v', 'x', 'p' (position), 'a' (arc mid point) or 'n' (net)
+    tokens: list[tuple[str, Union[tuple[float, float], str, None]]] = []
+    i = 0
+    length = len(route)
+    while i < length:
+        ch = route[i].lower()
+        if ch == 'f' or ch == 'b' or ch == 'v':
+            tokens.append((ch, None))
+        elif ch == 'x' or ch == '|':
+            tokens.append(('x', None))
+        elif ch == '(':
+            pos, i = parse_position(route, i)
+            tokens.append(('p', pos))
+        elif ch == 'a':
+            if i + 1 >= length or route[i + 1] != '(':
+                raise RouteParseError(f"Arc command must be followed by its mid point position in {route} at character position {i}")
+            pos, i = parse_position(route, i + 1)
+            tokens.append(('a', pos))
+        elif ch == '<':
+            closing = route.find('>', i)
+            if closing == -1:
+                raise RouteParseError(f'Unclosed net parenthesis in {route} at character position {i}')
+            tokens.append(('n', route[i + 1:closing]))
+            i = closing
+        else:
+            raise RouteParseError(f"Unsupported character '{ch}' at position {i}.")
+        i += 1
+    return tokens
+
+
+def expand_route(route: str, net: Union[str, None] = None, expanded: Union[ExpandedRoute, None] = None) -> ExpandedRoute:
+    # Expands route into segments and vias in router footprint local coordinates (mm)
+    return expand_tokens(tokenize_route(route), route, net, expanded)
+
+
+def expand_tokens(tokens: list[tuple[str, Union[tuple[float, float], str, None]]],
+                  route: str,
+                  net: Union[str, None] = None,
+                  expanded: Union[ExpandedRoute, None] = None) -> ExpandedRoute:
+    if expanded is None:
+        expanded = ExpandedRoute()
+    layer: Union[str, None] = None
+    start: Union[tuple[float, float], None] = None
+    mid: Union[tuple[float, float], None] = None
+    for cmd, arg in tokens:
+        if mid is not None and cmd != 'p':
+            raise RouteParseError(f"Arc mid point must be followed by the arc end position in {route}")
+        if cmd == 'f':
+            layer = 'F'
+        elif cmd == 'b':
+            layer = 'B'
+        elif cmd == 'v':
+            if start is None:
+                raise RouteParseError(f"Can't place via when position is not set in {route}, use (x,y) to set position")
+            expanded.vias.append(RouteVia(start, net))
+            if layer == 'F':
+                layer = 'B'
+            elif layer == 'B':
+                layer = 'F'
+        elif cmd == 'p':
+            pos: tuple[float, float] = arg  # type: ignore
+            if start is not None:
+                if layer is None:
+                    raise RouteParseError(f"Can't place segment before layer is set in {route}, use 'f' or 'b', to set starting layer")
+                expanded.segments.append(RouteSegment(start, pos, layer, net, mid))
+            start = pos
+            mid = None
+        elif cmd == 'a':
+            if start is None:
+                raise RouteParseError(f"Can't place arc when position is not set in {route}, use (x,y) to set position")
+            mid = arg  # type: ignore
+        elif cmd == 'n':
+            net = arg  # type: ignore
+            start = None
+        elif cmd == 'x':
+            start = None
+    if mid is not None:
+        raise RouteParseError(f"Arc mid point must be followed by the arc end position in {route}")
+    return expanded
+
+
+def expand_routes(routes: list[str], net: Union[str, None] = None) -> ExpandedRoute:
+    expanded = ExpandedRoute()
+    for route in routes:
+        expand_route(strip_route(route), net, expanded)
+    return expanded
+
+
+class RouteTransform:
+    # Maps router footprint local coordinates (mm) to board coordinates (KiCad internal units, nm) the way
+    # router.js adjust_point does, including rounding to 5 decimals that router.js applies to its output
+    # With mirror, local x is negated first, as router.js does for footprints on Ergogen mirrored points with the mirror
+    # param, and with swap_layers F and B are swapped as well (mirror_layers param)
+    ref_x: int
+    ref_y: int
+    cos: float
+    sin: float
+    mirror: bool
+    swap_layers: bool
+
+    def __init__(self, ref_x: int, ref_y: int, orientation: float, mirror: bool = False, swap_layers: bool = False):
+        self.ref_x = ref_x
+        self.ref_y = ref_y
+        radians = orientation / 180.0 * math.pi
+        self.cos = math.cos(radians)
+        self.sin = math.sin(radians)
+        self.mirror = mirror
+        self.swap_layers = swap_layers
+
+    def to_board(self, pos: tuple[float, float]) -> tuple[int, int]:
+        x, y = pos
+        if self.mirror:
+            x = -x
+        nx = round(self.ref_x / 1000000 + self.cos * x + self.sin * y, 5)
+        ny = round(self.ref_y / 1000000 + self.cos * y - self.sin * x, 5)
+        return (round(nx * 1000000), round(ny * 1000000))
+
+    def to_local(self, pos: tuple[int, int]) -> tuple[float, float]:
+        # Inverse of to_board (without rounding), board coordinates (nm) to router footprint local coordinates (mm)
+        dx = (pos[0] - self.ref_x) / 1000000
+        dy = (pos[1] - self.ref_y) / 1000000
+        x = dx * self.cos - dy * self.sin
+        return (-x if self.mirror else x, dx * self.sin + dy * self.cos)
+
+    def to_board_layer(self, layer: str) -> str:
+        if not self.swap_layers:
+            return layer
+        return {'F': 'B', 'B': 'F'}.get(layer, layer)
+
+
+def format_number(value: float) -> str:
+    # Routes are rounded to 5 decimals, print without float noise and trailing zeros
+    formatted = f'{value:.5f}'.rstrip('0').rstrip('.')
+    return '0' if formatted == '-0' else formatted
+
+
+def compact_route(route: str) -> list[Union[str, float]]:
+    # Compact pre-parsed form consumed by router.js 'compact_routes' param:
+    # [opcodes, args...] where opcodes has one letter per command ('f', 'b', 'v', 'x', 'p', 'a', 'n')
+    # and args is the flat list of arguments, two numbers per 'p' and 'a' and a net name per 'n'
+    ops = ''
+    args: list[Union[str, float]] = []
+    for cmd, arg in tokenize_route(route):
+        ops += cmd
+        if cmd == 'p' or cmd == 'a':
+            args.extend(arg)  # type: ignore
+        elif cmd == 'n':
+            args.append(arg)  # type: ignore
+    return [ops] + args
+
+
+def format_compact_route(compact: list[Union[str, float]]) -> str:
+    # Yaml flow sequence, strings are quoted so yaml never reads them as anything else
+    items = []
+    for item in compact:
+        if isinstance(item, str):
+            escaped = item.replace('\\', '\\\\').replace('"', '\\"')
+            items.append(f'"{escaped}"')
+        else:
+            items.append(format_number(item))
+    return '[' + ', '.join(items) + ']'
+
+
+def compact_route_tokens(compact: list[Union[str, float]]) -> list[tuple[str, Union[tuple[float, float], str, None]]]:
+    # Inverse of compact_route, returns the same tokens tokenize_route returns for the equivalent route string
+    tokens: list[tuple[str, Union[tuple[float, float], str, None]]] = []
+    if len(compact) == 0 or not isinstance(compact[0], str):
+        raise RouteParseError(f'Compact route must start with opcodes string: {compact}')
+    k = 1
+    for op in compact[0]:
+        if op == 'p' or op == 'a':
+            if k + 1 >= len(compact):
+                raise RouteParseError(f'Missing position arguments in compact route {compact}')
+            tokens.append((op, (float(compact[k]), float(compact[k + 1]))))
+            k += 2
+        elif op == 'n':
+            if k >= len(compact):
+                raise RouteParseError(f'Missing net argument in compact route {compact}')
+            tokens.append(('n', str(compact[k])))
+            k += 1
+        elif op in ('f', 'b', 'v', 'x'):
+            tokens.append((op, None))
+        else:
+            raise RouteParseError(f"Unsupported opcode '{op}' in compact route {compact}")
+    return tokens
+
+
+def tokens_to_route(tokens: list[tuple[str, Union[tuple[float, float], str, None]]]) -> str:
+    # Inverse of tokenize_route, e.g. for turning compact routes back into route strings
+    route = ''
+    for cmd, arg in tokens:
+        if cmd == 'p' or cmd == 'a':
+            pos: tuple[float, float] = arg  # type: ignore
+            route += f'{"A" if cmd == "a" else ""}({format_number(pos[0])},{format_number(pos[1])})'
+        elif cmd == 'n':
+            route += f'<{arg}>'
+        else:
+            route += cmd.upper() if cmd != 'x' else cmd
+    return route
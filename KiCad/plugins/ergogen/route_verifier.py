@@ -0,0 +1,127 @@
+from typing import Union
+from .route_parser import ExpandedRoute, RouteTransform, expand_routes
+from .spatial import GridIndex
+
+# Round trip verification - expands generated routes the way footprints/router.js does and diffs
+# the resulting segments/vias against the tracks/vias they were generated from.
+# Works on plain coordinates (KiCad internal units) so it doesn't depend on pcbnew
+
+# Routes are rounded to 5 decimals (10nm) when generated and again by router.js, allow a bit more than that
+DEFAULT_TOLERANCE = 50
+
+BoardSegment = tuple[tuple[int, int], tuple[int, int], str, Union[tuple[int, int], None]]  # (start, end, layer 'F'/'B', arc mid or None)
+BoardVia = tuple[int, int]
+
+
+class RouteDiff:
+    segments_count: int
+    vias_count: int
+    missing_segments: list[BoardSegment]  # on the board but not reproduced by the routes
+    extra_segments: list[BoardSegment]  # produced by the routes but not on the board
+    missing_vias: list[BoardVia]
+    extra_vias: list[BoardVia]
+
+    def __init__(self):
+        self.segments_count = 0
+        self.vias_count = 0
+        self.missing_segments = []
+        self.extra_segments = []
+        self.missing_vias = []
+        self.extra_vias = []
+
+    def is_match(self) -> bool:
+        return len(self.missing_segments) == 0 and len(self.extra_segments) == 0 and len(self.missing_vias) == 0 and len(self.extra_vias) == 0
+
+    def summary(self, max_items: int = 10) -> list[str]:
+        if self.is_match():
+            return [f'Verification OK: routes reproduce {self.segments_count} tracks and {self.vias_count} vias']
+        lines = [f'Verification FAILED: {len(self.missing_segments)} tracks missing, {len(self.extra_segments)} extra tracks, '
+                 f'{len(self.missing_vias)} vias missing, {len(self.extra_vias)} extra vias']
+
+        def fmt(pos: tuple[int, int]) -> str:
+            return f'({pos[0] / 1000000},{pos[1] / 1000000})'
+
+        for title, segments in (('missing track', self.missing_segments), ('extra track', self.extra_segments)):
+            for start, end, layer, mid in segments[:max_items]:
+                lines.append(f'  {title}: {layer} {fmt(start)}->{fmt(end)}' + ('' if mid is None else f' arc via {fmt(mid)}'))
+        for title, vias in (('missing via', self.missing_vias), ('extra via', self.extra_vias)):
+            for pos in vias[:max_items]:
+                lines.append(f'  {title}: {fmt(pos)}')
+        return lines
+
+
+def diff_expanded(expanded: ExpandedRoute,
+                  transform: RouteTransform,
+                  board_segments: list[BoardSegment],
+                  board_vias: list[BoardVia],
+                  tolerance: int = DEFAULT_TOLERANCE) -> RouteDiff:
+    diff = RouteDiff()
+    diff.segments_count = len(board_segments)
+    diff.vias_count = len(board_vias)
+
+    # Index board items by their endpoints, each board item can be matched once so duplicates are caught as well
+    segments_index: GridIndex[int] = GridIndex(max(tolerance * 4, 1000))
+    for idx, (start, end, layer, mid) in enumerate(board_segments):
+        segments_index.insert(start[0], start[1], idx)
+    vias_index: GridIndex[int] = GridIndex(max(tolerance * 4, 1000))
+    for idx, pos in enumerate(board_vias):
+        vias_index.insert(pos[0], pos[1], idx)
+    matched_segments: set[int] = set()
+    matched_vias: set[int] = set()
+
+    def close(p1: tuple[int, int], p2: tuple[int, int]) -> bool:
+        return abs(p1[0] - p2[0]) <= tolerance and abs(p1[1] - p2[1]) <= tolerance
+
+    def find_segment(start: tuple[int, int], end: tuple[int, int], layer: str, mid: Union[tuple[int, int], None]) -> Union[int, None]:
+        # Board segment may have been walked in either direction, an arc's mid point is the same either way
+        for lookup, other in ((start, end), (end, start)):
+            for idx in segments_index.query(lookup[0], lookup[1], tolerance * 1.5):
+                if idx in matched_segments:
+                    continue
+                _, board_end, board_layer, board_mid = board_segments[idx]
+                if board_layer != layer or not close(board_end, other):
+                    continue
+                if (mid is None) != (board_mid is None) or (mid is not None and not close(mid, board_mid)):  # type: ignore
+                    continue
+                return idx
+        return None
+
+    for segment in expanded.segments:
+        start = transform.to_board(segment.start)
+        end = transform.to_board(segment.end)
+        mid = None if segment.mid is None else transform.to_board(segment.mid)
+        layer = transform.to_board_layer(segment.layer)
+        idx = find_segment(start, end, layer, mid)
+        if idx is None:
+            diff.extra_segments.append((start, end, layer, mid))
+        else:
+            matched_segments.add(idx)
+
+    for via in expanded.vias:
+        pos = transform.to_board(via.pos)
+        found: Union[int, None] = None
+        for idx in vias_index.query(pos[0], pos[1], tolerance * 1.5):
+            if idx not in matched_vias:
+                found = idx
+                break
+        if found is None:
+            diff.extra_vias.append(pos)
+        else:
+            matched_vias.add(found)
+
+    diff.missing_segments = [segment for idx, segment in enumerate(board_segments) if idx not in matched_segments]
+    diff.missing_vias = [via for idx, via in enumerate(board_vias) if idx not in matched_vias]
+    return diff
+
+
+def diff_routes(routes: list[str],
+                ref_x: int,
+                ref_y: int,
+                orientation: float,
+                board_segments: list[BoardSegment],
+                board_vias: list[BoardVia],
+                tolerance: int = DEFAULT_TOLERANCE,
+                mirror: bool = False,
+                swap_layers: bool = False) -> RouteDiff:
+    return diff_expanded(expand_routes(routes), RouteTransform(ref_x, ref_y, orientation, mirror, swap_layers), board_segments, board_vias,
+                         tolerance)
@@ -0,0 +1,233 @@
+from typing import Union
+import json
+from .route_parser import ExpandedRoute, RouteParseError, compact_route_tokens, expand_route, expand_tokens, split_route_comment, strip_route
+
+# Minimal reader of router footprint blocks from Ergogen yaml (either a full config file or the plugin's own output).
+# KiCad's bundled python doesn't come with a yaml parser, and we only need the router blocks, so this is line based
+# and understands the layout the plugin generates and the common hand written variations of it:
+#
+#   <name>:
+#     what: router
+#     where: ...
+#     params:
+#       net: ...
+#       route: "..."
+#       routes:
+#         - "..."
+#       compact_routes:
+#         - ["...", ...]
+
+
+class RouterBlock:
+    name: str
+    where: str
+    params: dict[str, str]
+    routes: list[str]  # route strings, as written (may include quotes and '# ...' remarks)
+    compact_routes: list[list[Union[str, float]]]
+    first_line: int
+    last_line: int
+    lines: list[str]  # the block's lines as written, first_line to last_line
+
+    def __init__(self, name: str):
+        self.name = name
+        self.where = ''
+        self.params = {}
+        self.routes = []
+        self.compact_routes = []
+        self.first_line = -1
+        self.last_line = -1
+        self.lines = []
+
+    def expand(self) -> ExpandedRoute:
+        # Segments and vias of all routes in the block, in router footprint local coordinates
+        expanded = ExpandedRoute()
+        for route in self.routes:
+            expand_route(strip_route(route), None, expanded)
+        for compact in self.compact_routes:
+            expand_tokens(compact_route_tokens(compact), str(compact), None, expanded)
+        return expanded
+
+    def get_number_param(self, key: str, default: float) -> float:
+        try:
+            return float(self.params[key])
+        except (KeyError, ValueError):
+            return default
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(' '))
+
+
+def _is_blank(line: str) -> bool:
+    stripped = line.strip()
+    return stripped == '' or stripped.startswith('#')
+
+
+def _split_key_value(line: str) -> tuple[str, str]:
+    key, _, value = line.strip().partition(':')
+    value = value.strip()
+    if value.startswith('#'):
+        value = ''
+    return key.strip(), value
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return split_route_comment(value)[0] if '#' in value else value
+
+
+def parse_router_blocks(text: str) -> list[RouterBlock]:
+    lines = text.split('\n')
+    blocks: list[RouterBlock] = []
+
+    for idx, line in enumerate(lines):
+        if _is_blank(line):
+            continue
+        key, value = _split_key_value(line)
+        if key != 'what' or _unquote(value) != 'router':
+            continue
+
+        # The block name is the closest previous key with lower indent
+        what_indent = _indent(line)
+        name_idx = idx - 1
+        while name_idx >= 0 and (_is_blank(lines[name_idx]) or _indent(lines[name_idx]) >= what_indent):
+            name_idx -= 1
+        if name_idx < 0:
+            continue
+        block = RouterBlock(_split_key_value(lines[name_idx])[0])
+        block.first_line = name_idx
+
+        # The block ends at the first line with lower indent than its keys
+        end_idx = name_idx + 1
+        while end_idx < len(lines) and (_is_blank(lines[end_idx]) or _indent(lines[end_idx]) >= what_indent):
+            end_idx += 1
+        block.last_line = end_idx - 1
+        while block.last_line > idx and _is_blank(lines[block.last_line]):
+            block.last_line -= 1
+        block.lines = [block_line.rstrip('\r') for block_line in lines[block.first_line:block.last_line + 1]]
+
+        params_indent: Union[int, None] = None
+        list_key: Union[str, None] = None
+        list_indent = 0
+        for line_idx in range(name_idx + 1, end_idx):
+            block_line = lines[line_idx]
+            if _is_blank(block_line):
+                continue
+            line_indent = _indent(block_line)
+            stripped = block_line.strip()
+            if list_key is not None and line_indent >= list_indent and stripped.startswith('-'):
+                item = stripped[1:].strip()
+                if list_key == 'routes':
+                    block.routes.append(item)
+                elif list_key == 'compact_routes':
+                    block.compact_routes.append(parse_compact_route(item))
+                continue
+            list_key = None
+            key, value = _split_key_value(block_line)
+            if line_indent == what_indent:
+                params_indent = None
+                if key == 'where':
+                    block.where = value
+                elif key == 'params':
+                    params_indent = line_indent
+            elif params_indent is not None and line_indent > params_indent:
+                if key == 'route':
+                    if value != '':
+                        block.routes.append(value)
+                elif key == 'routes' or key == 'compact_routes':
+                    if value == '':
+                        list_key = key
+                        list_indent = line_indent
+                    elif key == 'routes':
+                        # Inline flow lists are only supported json compatible (double quoted)
+                        block.routes.extend(f'"{route}"' for route in json.loads(value))
+                    else:
+                        block.compact_routes.extend(json.loads(value))
+                else:
+                    block.params[key] = _unquote(value)
+        blocks.append(block)
+
+    return blocks
+
+
+def parse_compact_route(item: str) -> list[Union[str, float]]:
+    # Compact routes are yaml flow sequences the plugin writes json compatible, strip a trailing remark if any
+    closing = item.rfind(']')
+    if not item.startswith('[') or closing == -1:
+        raise RouteParseError(f'Invalid compact route {item}')
+    return json.loads(item[:closing + 1])
+
+
+def replace_block_routes(block: RouterBlock, items: list[str], list_key: str, set_params: dict[str, str], tab_size: int) -> str:
+    # The block as written with its route lists (route, routes and compact_routes) replaced by a single list_key list of items
+    # (yaml list item values) where the first of them was, and set_params set. Everything else, other params included, is kept
+    # as written, so pasting it over the block changes only its routes. Re-indented to the plugin output's indentation
+    key_indent: Union[int, None] = None
+    params_idx: Union[int, None] = None  # of 'params:' in output
+    params_end = 0  # output index after the last params line
+    child_indent: Union[int, None] = None
+    item_indent: Union[int, None] = None
+    routes_idx: Union[int, None] = None  # output index the list goes to
+    remaining_params = dict(set_params)
+    output = block.lines[:1]
+    in_params = False
+    idx = 1
+    while idx < len(block.lines):
+        line = block.lines[idx]
+        idx += 1
+        if _is_blank(line):
+            output.append(line)
+            continue
+        line_indent = _indent(line)
+        key, value = _split_key_value(line)
+        if key_indent is None:
+            key_indent = line_indent
+        if line_indent <= key_indent:
+            in_params = key == 'params'
+            if in_params:
+                params_idx = len(output)
+                params_end = params_idx + 1
+            output.append(line)
+            continue
+        if in_params:
+            if child_indent is None:
+                child_indent = line_indent
+            if line_indent == child_indent and key in ('route', 'routes', 'compact_routes'):
+                if routes_idx is None:
+                    routes_idx = len(output)
+                if value == '' and key != 'route':
+                    # Skip the list items, blank and comment lines in between them too
+                    last_item = idx - 1
+                    while idx < len(block.lines) and (_is_blank(block.lines[idx]) or
+                                                      (_indent(block.lines[idx]) >= line_indent and block.lines[idx].strip().startswith('-'))):
+                        if not _is_blank(block.lines[idx]):
+                            last_item = idx
+                            item_indent = item_indent or _indent(block.lines[idx])
+                        idx += 1
+                    idx = last_item + 1
+                continue
+            if line_indent == child_indent and key in remaining_params:
+                line = f'{line[:line_indent]}{key}: {remaining_params.pop(key)}'
+            params_end = len(output) + 1
+        output.append(line)
+
+    if key_indent is None:
+        key_indent = _indent(block.lines[0]) + tab_size
+    if params_idx is None:
+        params_idx = len(output)
+        output.append(key_indent * ' ' + 'params:')
+        params_end = len(output)
+    if child_indent is None:
+        child_indent = key_indent + tab_size
+    if routes_idx is None:
+        routes_idx = params_end
+    added_params = [child_indent * ' ' + f'{key}: {value}' for key, value in remaining_params.items()]
+    output[params_idx + 1:params_idx + 1] = added_params
+    if routes_idx > params_idx:
+        routes_idx += len(added_params)
+    item_indent = item_indent or child_indent + tab_size
+    output[routes_idx:routes_idx] = [child_indent * ' ' + f'{list_key}:'] + [item_indent * ' ' + f'- {item}' for item in items]
+
+    shift = tab_size - _indent(block.lines[0])
+    return ''.join(('' if line.strip() == '' else max(_indent(line) + shift, 0) * ' ' + line.lstrip(' ')) + '\n' for line in output)
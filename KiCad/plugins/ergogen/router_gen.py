@@ -2,11 +2,27 @@ from typing import Union, cast
 import pcbnew
 from collections import defaultdict
 import decimal
+import fnmatch
 import math
+from .config_diff import block_route_lines, diff_router_routes
+from .route_parser import RouteParseError, RouteTransform, compact_route, format_compact_route, split_route_comment
+from .route_library import PadSignature, template_key
+from .router_config import RouterBlock, parse_router_blocks, replace_block_routes
+from .route_verifier import RouteDiff, diff_routes
+from .track_cleanup import CleanupConnectivity, cleanup_tracks
+from .items import track_mid
 from .helper import get_logger
 logger = get_logger(__name__)
 
 
+# Type descriptions of PCB_TRACK and PCB_ARC, arcs are handled as tracks that also have a mid point
+TRACK_TYPES = ('Track', 'Arc')
+
+# Tolerances matching footprints with their mirrored counterparts
+MIRROR_POS_TOLERANCE = 10000  # 10um, in KiCad internal units
+MIRROR_ANGLE_TOLERANCE = 0.01  # degrees
+
+
 def log_track(track: pcbnew.PCB_TRACK, prefix=""):
     logger.debug(f'{prefix}{track.GetTypeDesc()}: NC:{track.GetNetCode()},NN:{track.GetNetname()},({pcbnew.ToMM(track.GetX())},{pcbnew.ToMM(track.GetY())})->({pcbnew.ToMM(track.GetEndX())},{pcbnew.ToMM(track.GetEndY())}), {track.m_Uuid.AsString()}')  # noqa: E501
 
@@ -20,6 +36,11 @@ class SelectionAnalysis:
     nets: set[str]
     unsupported_count: int
     unsupported_types: set[str]
+    # Per item state so the analysis can be updated by selection deltas (see update) instead of rescanning the selection
+    items: dict[str, tuple[str, str, float]]  # uuid -> (type, reference for footprints / net for tracks, footprint area)
+    fps_refs: dict[str, int]  # reference counts of fps, nets and unsupported_types, an entry goes away with its last item
+    nets_refs: dict[str, int]
+    unsupported_refs: dict[str, int]
 
     def __init__(self):
         self.fp_count = 0
@@ -30,119 +51,383 @@ class SelectionAnalysis:
         self.nets = set()
         self.unsupported_count = 0
         self.unsupported_types = set()
+        self.items = {}
+        self.fps_refs = {}
+        self.nets_refs = {}
+        self.unsupported_refs = {}
+
+    @staticmethod
+    def _add_ref(refs: dict[str, int], values: set[str], value: str):
+        refs[value] = refs.get(value, 0) + 1
+        values.add(value)
+
+    @staticmethod
+    def _remove_ref(refs: dict[str, int], values: set[str], value: str):
+        refs[value] -= 1
+        if refs[value] == 0:
+            del refs[value]
+            values.discard(value)
+
+    def add_item(self, uuid: str, item: pcbnew.BOARD_ITEM):
+        item_type = item.GetTypeDesc()
+        key = ''
+        area = 0.0
+        if item_type == 'Footprint':
+            self.fp_count += 1
+            fp: pcbnew.FOOTPRINT = item.Cast()
+            key = fp.GetReferenceAsString()
+            area = fp.GetArea()
+            self._add_ref(self.fps_refs, self.fps, key)
+        elif item_type in TRACK_TYPES:
+            self.tracks_count += 1
+            track: pcbnew.PCB_TRACK = item.Cast()
+            key = track.GetNetname()
+            self._add_ref(self.nets_refs, self.nets, key)
+        elif item_type == 'Via':
+            self.vias_count += 1
+        else:
+            self.unsupported_count += 1
+            self._add_ref(self.unsupported_refs, self.unsupported_types, item_type)
+        self.items[uuid] = (item_type, key, area)
+
+    def remove_item(self, uuid: str):
+        item_type, key, _ = self.items.pop(uuid)
+        if item_type == 'Footprint':
+            self.fp_count -= 1
+            self._remove_ref(self.fps_refs, self.fps, key)
+        elif item_type in TRACK_TYPES:
+            self.tracks_count -= 1
+            self._remove_ref(self.nets_refs, self.nets, key)
+        elif item_type == 'Via':
+            self.vias_count -= 1
+        else:
+            self.unsupported_count -= 1
+            self._remove_ref(self.unsupported_refs, self.unsupported_types, item_type)
+
+    @staticmethod
+    def items_by_uuid(selected_items) -> dict[str, pcbnew.BOARD_ITEM]:
+        return {item.m_Uuid.AsString(): item for item in selected_items}
+
+    def update(self, selected: dict[str, pcbnew.BOARD_ITEM]) -> tuple[bool, bool, bool]:
+        # Applies the difference between the analyzed items and the selected ones (see items_by_uuid)
+        # Returns whether anything changed, whether nets changed and whether footprints changed
+        removed = [uuid for uuid in self.items if uuid not in selected]
+        added = [uuid for uuid in selected if uuid not in self.items and selected[uuid].IsSelected()]
+        if len(removed) == 0 and len(added) == 0:
+            return False, False, False
+
+        nets_before = set(self.nets)
+        fps_changed = False
+        for uuid in removed:
+            fps_changed = fps_changed or self.items[uuid][0] == 'Footprint'
+            self.remove_item(uuid)
+        for uuid in added:
+            self.add_item(uuid, selected[uuid])
+            fps_changed = fps_changed or self.items[uuid][0] == 'Footprint'
+        nets_changed = self.nets != nets_before
+        if fps_changed:
+            self.default_fp = ""
+            largest_fp_area = 0
+            for item_type, ref, area in self.items.values():
+                if item_type == 'Footprint' and area > largest_fp_area:
+                    self.default_fp = ref
+                    largest_fp_area = area
+        return True, nets_changed, fps_changed
 
 
 class RouterGen:
     board: pcbnew.BOARD
     connectivity: pcbnew.CONNECTIVITY_DATA
+    selection: Union[list[pcbnew.BOARD_ITEM], None]
+    # Optional per connected component cache of generated routes (see process_tracks_cached), used by the headless
+    # watch mode to regenerate only what changed. Entries used in a run are collected in next_component_cache
+    component_cache: Union[dict, None]
+    next_component_cache: dict
+
+    # board, connectivity and selection default to the live ones in KiCad, passing them in allows
+    # running the generator on a board loaded from file or on a recorded snapshot (see snapshot.py)
+    def __init__(self, board: Union[pcbnew.BOARD, None] = None, connectivity: Union[pcbnew.CONNECTIVITY_DATA, None] = None,
+                 selection: Union[list[pcbnew.BOARD_ITEM], None] = None):
+        self.board = pcbnew.GetBoard() if board is None else board
+        self.connectivity = self.board.GetConnectivity() if connectivity is None else connectivity
+        self.selection = selection
+        self.component_cache = None
+        self.next_component_cache = {}
+
+    def get_current_selection(self):
+        return pcbnew.GetCurrentSelection() if self.selection is None else self.selection
+
+    def get_selection_region(self) -> Union[pcbnew.BOX2I, None]:
+        # Bounding box of the selected footprints, used to limit selection tools to an area
+        region: Union[pcbnew.BOX2I, None] = None
+        for fp in self.get_selected_footprints():
+            if region is None:
+                region = fp.GetBoundingBox()
+            else:
+                region.Merge(fp.GetBoundingBox())
+        return region
 
-    def __init__(self):
-        self.board = pcbnew.GetBoard()
-        self.connectivity = self.board.GetConnectivity()
-
-    def lock_track_vias(self):
-        board: pcbnew.BOARD = pcbnew.GetBoard()
-        tracks = board.GetTracks()
+    def get_filtered_tracks(self, net_pattern: str = '', layer: str = '', region: Union[pcbnew.BOX2I, None] = None) -> list[pcbnew.PCB_TRACK]:
+        # Tracks/vias matching the filters, net_pattern is a shell style pattern (e.g. 'col*'), layer is 'F' or 'B'
+        # Vias are on both layers so they always pass the layer filter
+        tracks: list[pcbnew.PCB_TRACK] = []
         track: pcbnew.PCB_TRACK
-        for track in tracks:
-            track.SetLocked(True)
+        for track in self.board.GetTracks():
+            if net_pattern != '' and not fnmatch.fnmatchcase(track.GetNetname(), net_pattern):
+                continue
+            if layer != '' and track.GetTypeDesc() != 'Via' and track.GetLayerName()[0] != layer:
+                continue
+            if region is not None and (not region.Contains(track.GetStart()) or not region.Contains(track.GetEnd())):
+                continue
+            tracks.append(track)
+        return tracks
+
+    def lock_track_vias(self, net_pattern: str = '', layer: str = '', region: Union[pcbnew.BOX2I, None] = None) -> int:
+        # Only touch items whose state actually changes, and refresh once at the end
+        changed = 0
+        for track in self.get_filtered_tracks(net_pattern, layer, region):
+            if not track.IsLocked():
+                track.SetLocked(True)
+                changed += 1
         pcbnew.Refresh()
+        return changed
 
-    def select_unlocked_tracks_vias(self):
-        curr_sel = pcbnew.GetCurrentSelection()
+    def clear_selection(self):
         item: pcbnew.EDA_ITEM
-        for item in curr_sel:
+        for item in self.get_current_selection():
             item.ClearSelected()
-        board: pcbnew.BOARD = pcbnew.GetBoard()
-        tracks = board.GetTracks()
-        track: pcbnew.PCB_TRACK
+
+    def select_unlocked_tracks_vias(self, net_pattern: str = '', layer: str = '', region: Union[pcbnew.BOX2I, None] = None) -> int:
+        tracks = [track for track in self.get_filtered_tracks(net_pattern, layer, region) if not track.IsLocked()]
+        self.clear_selection()
         for track in tracks:
-            if not track.IsLocked():
-                track.SetSelected()
+            track.SetSelected()
         pcbnew.Refresh()
+        return len(tracks)
 
-    def select_connected_footprints(self):
-        board: pcbnew.BOARD = pcbnew.GetBoard()
-        selected_items = pcbnew.GetCurrentSelection()
-        conn: pcbnew.CONNECTIVITY_DATA = board.GetConnectivity()
-        for item in selected_items:
+    def select_connected_footprints(self) -> int:
+        # Collect the footprints first so each is selected once, and query each pad's footprint once
+        footprints: dict[str, pcbnew.FOOTPRINT] = {}
+        visited_pads: set[str] = set()
+        for item in self.get_current_selection():
             item_type = item.GetTypeDesc()
-            if item_type == 'Track' or item_type == 'Via':
-                pads: pcbnew.PADS = conn.GetConnectedPads(item)
+            if item_type in TRACK_TYPES or item_type == 'Via':
                 pad: pcbnew.PAD
-                for pad in  pads:
-                    fp: pcbnew.FOOTPRINT
-                    fp = pad.GetParentFootprint()
+                for pad in self.connectivity.GetConnectedPads(item):
+                    pad_uuid = pad.m_Uuid.AsString()
+                    if pad_uuid in visited_pads:
+                        continue
+                    visited_pads.add(pad_uuid)
+                    fp: pcbnew.FOOTPRINT = pad.GetParentFootprint()
                     if fp is not None:
-                        fp.SetSelected()
+                        footprints[fp.m_Uuid.AsString()] = fp
+        for fp in footprints.values():
+            if not fp.IsSelected():
+                fp.SetSelected()
         pcbnew.Refresh()
+        return len(footprints)
 
-    def select_all_footprints(self):
-        board: pcbnew.BOARD = pcbnew.GetBoard()
-        fps = board.GetFootprints()
+    def select_all_footprints(self, region: Union[pcbnew.BOX2I, None] = None) -> int:
+        count = 0
         fp: pcbnew.FOOTPRINT
-        for fp in fps:
-            fp.SetSelected()
-        pcbnew.Refresh()
-
-    def get_selection_analysis(self) -> SelectionAnalysis:
-        sel_analysis = SelectionAnalysis()
-        selected_items = pcbnew.GetCurrentSelection()
-        item: pcbnew.BOARD_ITEM
-        largest_fp_area = 0
-        for item in selected_items:
-            if not item.IsSelected():
+        for fp in self.board.GetFootprints():
+            if region is not None and not region.Contains(fp.GetPosition()):
                 continue
-            item_type = item.GetTypeDesc()
-            if item_type == 'Footprint':
-                sel_analysis.fp_count += 1
-                fp: pcbnew.FOOTPRINT = item.Cast()
-                sel_analysis.fps.add(fp.GetReferenceAsString())
-                if fp.GetArea() > largest_fp_area:
-                    sel_analysis.default_fp = fp.GetReferenceAsString()
-                    largest_fp_area = fp.GetArea()
-                # for pad in fp.Pads():
-                #     if self.connectivity.GetConnectedTracks(pad).size() != 0:
-                #         sel_analysis.nets.add(pad.GetNetname())
-            elif item_type == 'Track':
-                sel_analysis.tracks_count += 1
-                track: pcbnew.PCB_TRACK = item.Cast()
-                sel_analysis.nets.add(track.GetNetname())
-            elif item_type == 'Via':
-                sel_analysis.vias_count += 1
-            else:
-                sel_analysis.unsupported_count += 1
-                sel_analysis.unsupported_types.add(item_type)
-        return sel_analysis
-
-    def get_routes_yaml(self, routes, tab_size=2, fp_sec_name:str = "<routes_footpring_name>", filter:str ="true") -> str:
+            if not fp.IsSelected():
+                fp.SetSelected()
+            count += 1
+        pcbnew.Refresh()
+        return count
+
+    def get_selected_footprints(self) -> list[pcbnew.FOOTPRINT]:
+        return [item.Cast() for item in self.get_current_selection() if item.GetTypeDesc() == 'Footprint']
+
+    def get_selection_template_key(self, ref_fp_name: str) -> Union[tuple[str, list[str]], None]:
+        # Route library key of the selected footprints arrangement (see route_library.py) and their footprint ids,
+        # None if the reference footprint isn't selected
+        footprints = self.get_selected_footprints()
+        ref_fp = next((fp for fp in footprints if fp.GetReferenceAsString() == ref_fp_name), None)
+        if ref_fp is None:
+            return None
+        transform = RouteTransform(ref_fp.GetX(), ref_fp.GetY(), ref_fp.GetOrientationDegrees())
+        pads: list[PadSignature] = []
+        fpids: list[str] = []
+        for fp in footprints:
+            fpid = fp.GetFPIDAsString()
+            fpids.append(fpid)
+            pads.append((fpid, '', *transform.to_local((fp.GetX(), fp.GetY()))))  # footprint origin, covers footprints without pads
+            pad: pcbnew.PAD
+            for pad in fp.Pads():
+                pads.append((fpid, pad.GetNumber(), *transform.to_local((pad.GetX(), pad.GetY()))))
+        return template_key(pads), sorted(fpids)
+
+    def apply_router_block(self, block: RouterBlock, footprints: list[pcbnew.FOOTPRINT]) -> list[pcbnew.BOARD_ITEM]:
+        # Materializes the block's tracks/vias on each footprint the way Ergogen places the router footprint on it,
+        # so routes can be previewed without regenerating the board. Caller is expected to Refresh once when done
+        # With the block's mirror param, footprints on Ergogen mirrored points (the right one of a mirrored pair among footprints,
+        # see find_mirror_counterpart) get the routes mirrored, and with mirror_layers on swapped layers, as router.js does
+        expanded = block.expand()
+        mirror = block.params.get('mirror', '').lower() == 'true'
+        mirror_layers = block.params.get('mirror_layers', '').lower() == 'true'
+        width = pcbnew.FromMM(block.get_number_param('width', 0.25))
+        via_size = pcbnew.FromMM(block.get_number_param('via_size', 0.8))
+        via_drill = pcbnew.FromMM(block.get_number_param('via_drill', 0.4))
+        layers = {'F': pcbnew.F_Cu, 'B': pcbnew.B_Cu}
+        nets: dict[str, Union[pcbnew.NETINFO_ITEM, None]] = {}
+
+        def get_net(net_name: Union[str, None]) -> Union[pcbnew.NETINFO_ITEM, None]:
+            # Templated nets ({{colrow}}, ...) can't be resolved here, KiCad fills them in from the pads
+            if net_name is None:
+                net_name = block.params.get('net', '')
+            net_name = net_name.lstrip('!')
+            if net_name not in nets:
+                nets[net_name] = self.board.FindNet(net_name) if net_name != '' and '{{' not in net_name else None
+            return nets[net_name]
+
+        items: list[pcbnew.BOARD_ITEM] = []
+        for fp in footprints:
+            mirrored = False
+            if mirror:
+                counterpart = self.find_mirror_counterpart(fp, footprints)
+                mirrored = counterpart is not None and counterpart[0].GetX() < fp.GetX()
+            transform = RouteTransform(fp.GetX(), fp.GetY(), fp.GetOrientationDegrees(), mirrored, mirrored and mirror_layers)
+            for segment in expanded.segments:
+                if segment.mid is None:
+                    track = pcbnew.PCB_TRACK(self.board)
+                else:
+                    track = pcbnew.PCB_ARC(self.board)
+                    track.SetMid(pcbnew.VECTOR2I(*transform.to_board(segment.mid)))
+                track.SetStart(pcbnew.VECTOR2I(*transform.to_board(segment.start)))
+                track.SetEnd(pcbnew.VECTOR2I(*transform.to_board(segment.end)))
+                track.SetWidth(width)
+                track.SetLayer(layers[transform.to_board_layer(segment.layer)])
+                net = get_net(segment.net)
+                if net is not None:
+                    track.SetNet(net)
+                items.append(track)
+            for route_via in expanded.vias:
+                via = pcbnew.PCB_VIA(self.board)
+                via.SetViaType(pcbnew.VIATYPE_THROUGH)
+                via.SetPosition(pcbnew.VECTOR2I(*transform.to_board(route_via.pos)))
+                via.SetWidth(via_size)
+                via.SetDrill(via_drill)
+                via.SetLayerPair(pcbnew.F_Cu, pcbnew.B_Cu)
+                net = get_net(route_via.net)
+                if net is not None:
+                    via.SetNet(net)
+                items.append(via)
+        return items
+
+    def apply_routes(self, block: RouterBlock, footprints: list[pcbnew.FOOTPRINT], replaced_uuids: Union[list[str], None] = None) -> list[str]:
+        # Applies the router block onto the footprints, replacing previously applied items.
+        # Everything is built before the board is touched (so a parse error leaves it intact), then changed in one batch with a single refresh
+        # Returns the uuids of the applied items, items themselves aren't kept as the user may delete them (or undo) meanwhile
+        items = self.apply_router_block(block, footprints)
+        if replaced_uuids is not None:
+            self.remove_items(replaced_uuids, refresh=False)
+        for item in items:
+            self.board.Add(item)
+        pcbnew.Refresh()
+        logger.debug(f'Applied {len(items)} tracks/vias on {len(footprints)} footprints')
+        return [item.m_Uuid.AsString() for item in items]
+
+    def remove_items(self, uuids: list[str], refresh: bool = True):
+        # Removes previously applied items that are still on the board, looked up by uuid so items the user
+        # already deleted are never touched
+        if len(uuids) != 0:
+            remaining = set(uuids)
+            found = [track for track in self.board.GetTracks() if track.m_Uuid.AsString() in remaining]
+            for track in found:
+                self.board.Remove(track)
+        if refresh:
+            pcbnew.Refresh()
+
+    def get_routes_yaml(self, routes, tab_size=2, fp_sec_name:str = "<routes_footpring_name>", filter:str ="true", compact: bool = False,
+                        header: bool = True, mirror: bool = False, mirror_layers: bool = False) -> str:
         yaml = ""
-        yaml += 0 * tab_size * " " + "footprints:\n"
+        if header:
+            yaml += 0 * tab_size * " " + "footprints:\n"
         yaml += 1 * tab_size * " " + f'{fp_sec_name}:\n'
         yaml += 2 * tab_size * " " + "what: router\n"
         yaml += 2 * tab_size * " " + f'where: {filter}\n'
         yaml += 2 * tab_size * " " + "params:\n"
         yaml += 3 * tab_size * " " + "locked: false\n"
-        yaml += 3 * tab_size * " " + "routes:\n"
-        for route in routes:
-            yaml += 4 * tab_size * " " + '- ' + route + '\n'
+        if mirror:
+            yaml += 3 * tab_size * " " + "mirror: true\n"
+        if mirror_layers:
+            yaml += 3 * tab_size * " " + "mirror_layers: true\n"
+        yaml += 3 * tab_size * " " + ("compact_routes:\n" if compact else "routes:\n")
+        yaml += self.get_route_lines_yaml(routes, tab_size, compact)
         return yaml
 
+    def get_route_lines_yaml(self, routes: list[str], tab_size: int, compact: bool) -> str:
+        # Items of the routes/compact_routes list of a block
+        return ''.join(4 * tab_size * " " + '- ' + self.get_route_item_yaml(route, compact) + '\n' for route in routes)
+
+    def get_route_item_yaml(self, route: str, compact: bool) -> str:
+        if not compact:
+            return route
+        # Pre-parsed form, router.js consumes it without parsing route strings
+        route_str, comment = split_route_comment(route)
+        return format_compact_route(compact_route(route_str)) + (f'  # {comment}' if comment else '')
+
+    def get_routes_diff_yaml(self, block: Union[RouterBlock, None], routes: list[str], tab_size: int, fp_sec_name: str, where_filter: str,
+                             compact: bool, header: bool, mirror: bool = False, mirror_layers: bool = False,
+                             full_block: bool = False) -> tuple[str, bool]:
+        # The changes against the existing block as comments, followed by only the routes to add (new and changed ones),
+        # ready to paste into the block's routes list. With full_block, followed by the whole block as written with the changes
+        # applied instead (unchanged routes kept as written, in place, and all other keys kept). Nothing but a comment if there are no changes
+        # Returns the yaml and whether it has a full block (so the 'footprints:' header was output if requested)
+        if block is None:
+            return (f'# Block {fp_sec_name} not found in config, generated in full\n' +
+                    self.get_routes_yaml(routes, tab_size, fp_sec_name, where_filter, compact, header, mirror, mirror_layers), True)
+        diff = diff_router_routes(block_route_lines(block), routes)
+        yaml = f'# Diff against existing {fp_sec_name} block: ' + '\n# '.join(diff.summary()) + '\n'
+        mirror_changed = (block.params.get('mirror') == 'true', block.params.get('mirror_layers') == 'true') != (mirror, mirror_layers)
+        if mirror_changed:
+            yaml += f'# Mirror params changed to mirror: {str(mirror).lower()}, mirror_layers: {str(mirror_layers).lower()}\n'
+        if not diff.has_changes() and not mirror_changed:
+            return (yaml, False)
+        block_compact = compact or len(block.compact_routes) != 0
+        if full_block:
+            set_params = {}
+            if mirror_changed:
+                for key, value in (('mirror', mirror), ('mirror_layers', mirror_layers)):
+                    if value or key in block.params:
+                        set_params[key] = str(value).lower()
+            items = [self.get_route_item_yaml(route, block_compact) for route in diff.merged]
+            block_yaml = replace_block_routes(block, items, 'compact_routes' if block_compact else 'routes', set_params, tab_size)
+            return (yaml + ("footprints:\n" if header else "") + block_yaml, True)
+        new_routes = diff.added + [generated for _, generated in diff.changed]
+        if len(new_routes) != 0:
+            yaml += f'# Routes to add to the {fp_sec_name} routes list, after deleting the removed and changed routes listed above:\n'
+            yaml += self.get_route_lines_yaml(new_routes, tab_size, block_compact)
+        return (yaml, False)
 
     def get_selection_router_config(self, ref_fp_name: str, nets_map: dict[str, str], footprint_tracks: bool, selected_tracks_vias: bool,
                                     include_locked_tracks_vias:bool, 
-                                    place_nets:bool = True, tab_size: int = 2, fp_sec_name:str= "", where_filter:str = "true") -> str:
-        selected_items = pcbnew.GetCurrentSelection()
+                                    place_nets:bool = True, tab_size: int = 2, fp_sec_name:str= "", where_filter:str = "true",
+                                    verify: bool = False, compact: bool = False, extra_ref_fp_names: Union[list[str], None] = None,
+                                    diff_config_path: str = "", diff_full_blocks: bool = False, cleanup: bool = False, mirror: bool = False) -> str:
+        # With cleanup, duplicate vias/tracks and overlapping colinear tracks are collapsed first (see track_cleanup.py)
+        # With mirror, reference footprints and their mirrored counterparts in the selection share a single block, see
+        # find_mirror_counterpart and get_groups_router_config
+        # With extra_ref_fp_names, each connected group of tracks/vias goes to the nearest of all the reference footprints
+        # and a router block is generated per reference footprint, named <fp_sec_name>_<reference>. The blocks of the extra
+        # references get a <where_<reference>> placeholder filter, as where_filter matches the points of ref_fp_name
+        # With diff_config_path, blocks existing in that config file are output as a diff against it (see config_diff.py), only the
+        # routes to add or, with diff_full_blocks, the whole updated blocks
+        selected_items = self.get_current_selection()
         footprints: list[pcbnew.FOOTPRINT] = []
-        ref_fp: Union[pcbnew.FOOTPRINT, None] = None
+        footprints_by_ref: dict[str, pcbnew.FOOTPRINT] = {}
         all_tracks: dict[str, pcbnew.PCB_TRACK] = {}
         all_vias: dict[str, pcbnew.PCB_VIA] = {}
 
         for item in selected_items:
             if item.GetTypeDesc() == 'Footprint':
-                footprints.append(item.Cast())
-                if item.GetReferenceAsString() == ref_fp_name:
-                    ref_fp = item
+                fp: pcbnew.FOOTPRINT = item.Cast()
+                footprints.append(fp)
+                footprints_by_ref[fp.GetReferenceAsString()] = fp
 
         if len(footprints) == 0:
             result = 'No footprints in selection, at least one needed for reference position'
@@ -156,7 +441,7 @@ class RouterGen:
         # Add explicitly selected items if requested
         if selected_tracks_vias:
             for item in selected_items:
-                if item.GetTypeDesc() == 'Track':
+                if item.GetTypeDesc() in TRACK_TYPES:
                     all_tracks[item.m_Uuid.AsString()] = item.Cast()
                 elif item.GetTypeDesc() == 'Via':
                     all_vias[item.m_Uuid.AsString()] = item.Cast()
@@ -171,19 +456,241 @@ class RouterGen:
             logger.debug("@ Result: " + result)
             return result
 
-        if ref_fp is not None:
-            routes = self.process_tracks(all_tracks, all_vias, ref_fp.GetX(), ref_fp.GetY(),
-                                         ref_fp.GetOrientationDegrees(), place_nets, nets_map)
-            result = self.get_routes_yaml(routes, tab_size, fp_sec_name, where_filter)
-            logger.debug("@ Result:\n" + result)
-            return result
+        ref_fps: list[pcbnew.FOOTPRINT] = []
+        for name in [ref_fp_name] + (extra_ref_fp_names or []):
+            if name not in footprints_by_ref:
+                result = 'No reference footprint selected' if name == ref_fp_name else f'Reference footprint {name} is not in selection'
+                logger.debug("@ Result: " + result)
+                return result
+            if footprints_by_ref[name] not in ref_fps:
+                ref_fps.append(footprints_by_ref[name])
+
+        mirrors: list[Union[tuple[pcbnew.FOOTPRINT, bool], None]] = [None] * len(ref_fps)
+        if mirror:
+            ref_uuids = set(ref_fp.m_Uuid.AsString() for ref_fp in ref_fps)
+            for idx, ref_fp in enumerate(ref_fps):
+                counterpart = self.find_mirror_counterpart(ref_fp, footprints)
+                # A counterpart that is a reference footprint itself keeps its own block
+                if counterpart is not None and counterpart[0].m_Uuid.AsString() not in ref_uuids:
+                    mirrors[idx] = counterpart
+
+        if cleanup:
+            cleaned = cleanup_tracks(all_tracks, all_vias)
+            if cleaned.has_changes():
+                # Generation walks the cleaned up items, so connectivity queries must answer in their terms too
+                connectivity = self.connectivity
+                self.connectivity = CleanupConnectivity(connectivity, cleaned)  # pyright: ignore
+                try:
+                    result = self.get_groups_router_config(ref_fps, cleaned.tracks, cleaned.vias, nets_map, place_nets, tab_size, fp_sec_name,
+                                                           where_filter, verify, compact, diff_config_path, diff_full_blocks, mirrors)
+                finally:
+                    self.connectivity = connectivity
+                return result + f'# {cleaned.summary()}\n'
+
+        return self.get_groups_router_config(ref_fps, all_tracks, all_vias, nets_map, place_nets, tab_size, fp_sec_name,
+                                             where_filter, verify, compact, diff_config_path, diff_full_blocks, mirrors)
+
+    def get_groups_router_config(self, ref_fps: list[pcbnew.FOOTPRINT], all_tracks: dict[str, pcbnew.PCB_TRACK], all_vias: dict[str, pcbnew.PCB_VIA],
+                                 nets_map: dict[str, str], place_nets: bool, tab_size: int, fp_sec_name: str, where_filter: str,
+                                 verify: bool, compact: bool, diff_config_path: str, diff_full_blocks: bool = False,
+                                 mirrors: Union[list[Union[tuple[pcbnew.FOOTPRINT, bool], None]], None] = None) -> str:
+        # mirrors has, per reference footprint, its mirrored counterpart and whether layers are swapped between them (or None).
+        # A reference and its counterpart get a single block with the mirror param. Ergogen mirrors the left half to the right,
+        # so routes are generated in the left footprint's frame, from its tracks or, when only the right half is routed,
+        # from the right footprint's tracks canonicalized under reflection. The other half is verified against the block
+        if mirrors is None:
+            mirrors = [None] * len(ref_fps)
+        all_refs = ref_fps + [mirrored[0] for mirrored in mirrors if mirrored is not None]
+        if len(all_refs) == 1:
+            groups = {ref_fps[0].m_Uuid.AsString(): (all_tracks, all_vias)}
         else:
-            result = 'No reference footprint selected'
-            logger.debug("@ Result: " + result)
-            return result
+            groups = {ref_fp.m_Uuid.AsString(): (tracks, vias) for ref_fp, tracks, vias in self.assign_to_references(all_tracks, all_vias, all_refs)}
+
+        existing_blocks: Union[dict[str, RouterBlock], None] = None
+        if diff_config_path != "":
+            try:
+                with open(diff_config_path, encoding='utf-8') as f:
+                    existing_blocks = {block.name: block for block in parse_router_blocks(f.read())}
+            except (OSError, RouteParseError, ValueError) as e:
+                result = f'Failed reading router blocks from config file {diff_config_path}: {e}'
+                logger.debug("@ Result: " + result)
+                return result
+
+        result = ""
+        header_written = False  # 'footprints:' goes before the first full block
+        for ref_fp, mirrored in zip(ref_fps, mirrors):
+            # Halves as (footprint, tracks, vias, mirror, swap_layers), the right half of a mirrored pair is in the mirrored
+            # frame. The block's routes are generated from the first half that has any tracks/vias
+            halves = [(ref_fp, *groups.get(ref_fp.m_Uuid.AsString(), ({}, {})))]
+            swap_layers = False
+            if mirrored is not None:
+                counterpart, swap_layers = mirrored
+                halves.append((counterpart, *groups.get(counterpart.m_Uuid.AsString(), ({}, {}))))
+                halves.sort(key=lambda half: half[0].GetX())
+                halves = [(*halves[0], False, False), (*halves[1], True, swap_layers)]
+            else:
+                halves = [(*halves[0], False, False)]
+            routed = [half for half in halves if len(half[1]) != 0 or len(half[2]) != 0]
+            if len(routed) == 0:
+                if len(all_refs) != 1:
+                    # No block, but say so, an empty or mistyped reference shouldn't look like a successful run
+                    result += f'# {", ".join(half[0].GetReferenceAsString() for half in halves)}: no tracks/vias assigned\n'
+                    continue
+                routed = halves[:1]
+
+            source_fp, tracks, vias, source_mirror, source_swap_layers = routed[0]
+            routes = self.process_tracks_cached(tracks, vias, source_fp.GetX(), source_fp.GetY(), source_fp.GetOrientationDegrees(),
+                                                place_nets, nets_map, source_mirror, source_swap_layers)
+            sec_name = fp_sec_name if len(ref_fps) == 1 else f'{fp_sec_name}_{ref_fp.GetReferenceAsString()}'
+            sec_where = where_filter if ref_fp is ref_fps[0] else f'<where_{ref_fp.GetReferenceAsString()}>'
+            if existing_blocks is not None:
+                yaml, has_block = self.get_routes_diff_yaml(existing_blocks.get(sec_name), routes, tab_size, sec_name, sec_where, compact,
+                                                            not header_written, mirrored is not None, swap_layers, diff_full_blocks)
+                result += yaml
+                header_written = header_written or has_block
+            else:
+                result += self.get_routes_yaml(routes, tab_size, sec_name, sec_where, compact, not header_written, mirrored is not None, swap_layers)
+                header_written = True
+            if verify:
+                diff = self.verify_routes(routes, tracks, vias, source_fp.GetX(), source_fp.GetY(), source_fp.GetOrientationDegrees(),
+                                          source_mirror, source_swap_layers)
+                result += ''.join(f'# {line}\n' for line in diff.summary())
+            if mirrored is not None:
+                prefix = f'Mirror {halves[0][0].GetReferenceAsString()} <-> {halves[1][0].GetReferenceAsString()}'
+                if len(routed) == 1:
+                    result += f'# {prefix}: only {source_fp.GetReferenceAsString()} is routed, routes taken from it\n'
+                else:
+                    other_fp, other_tracks, other_vias, other_mirror, other_swap_layers = routed[1]
+                    diff = self.verify_routes(routes, other_tracks, other_vias, other_fp.GetX(), other_fp.GetY(), other_fp.GetOrientationDegrees(),
+                                              other_mirror, other_swap_layers)
+                    result += ''.join(f'# {prefix}: {line}\n' for line in diff.summary())
+        logger.debug("@ Result:\n" + result)
+        return result
+
+    def verify_routes(self, routes: list[str], tracks_by_uuid: dict[str, pcbnew.PCB_TRACK], vias_by_uuid: dict[str, pcbnew.PCB_VIA],
+                      ref_x: int, ref_y: int, orientation: float, mirror: bool = False, swap_layers: bool = False) -> RouteDiff:
+        # Expands the routes back to board segments/vias like router.js would and diffs against the source items
+        board_segments = []
+        for track in tracks_by_uuid.values():
+            start = (track.GetX(), track.GetY())
+            end = (track.GetEndX(), track.GetEndY())
+            if start != end:  # zero length tracks can't be expressed in a route
+                board_segments.append((start, end, track.GetLayerName()[0], track_mid(track)))
+        board_vias = [(via.GetX(), via.GetY()) for via in vias_by_uuid.values()]
+        diff = diff_routes(routes, ref_x, ref_y, orientation, board_segments, board_vias, mirror=mirror, swap_layers=swap_layers)
+        for line in diff.summary():
+            logger.debug(line)
+        return diff
 
 ##################################################################
 
+    def get_track_components(self, tracks_by_uuid: dict[str, pcbnew.PCB_TRACK],
+                             vias_by_uuid: dict[str, pcbnew.PCB_VIA]) -> list[tuple[dict[str, pcbnew.PCB_TRACK], dict[str, pcbnew.PCB_VIA]]]:
+        # Groups tracks/vias connected at exact positions (same rule routes use to continue), union-find over positions
+        parent: dict[tuple[int, int], tuple[int, int]] = {}
+
+        def find(pos: tuple[int, int]) -> tuple[int, int]:
+            parent.setdefault(pos, pos)
+            while parent[pos] != pos:
+                parent[pos] = parent[parent[pos]]
+                pos = parent[pos]
+            return pos
+
+        def union(pos1: tuple[int, int], pos2: tuple[int, int]):
+            root1 = find(pos1)
+            root2 = find(pos2)
+            if root1 != root2:
+                parent[root1] = root2
+
+        for track in tracks_by_uuid.values():
+            union((track.GetX(), track.GetY()), (track.GetEndX(), track.GetEndY()))
+        for via in vias_by_uuid.values():
+            find((via.GetX(), via.GetY()))
+
+        components: dict[tuple[int, int], tuple[dict[str, pcbnew.PCB_TRACK], dict[str, pcbnew.PCB_VIA]]] = {}
+        for uuid, track in tracks_by_uuid.items():
+            components.setdefault(find((track.GetX(), track.GetY())), ({}, {}))[0][uuid] = track
+        for uuid, via in vias_by_uuid.items():
+            components.setdefault(find((via.GetX(), via.GetY())), ({}, {}))[1][uuid] = via
+        return list(components.values())
+
+    def assign_to_references(self, tracks_by_uuid: dict[str, pcbnew.PCB_TRACK], vias_by_uuid: dict[str, pcbnew.PCB_VIA],
+                             ref_fps: list[pcbnew.FOOTPRINT]) -> list[tuple[pcbnew.FOOTPRINT, dict[str, pcbnew.PCB_TRACK], dict[str, pcbnew.PCB_VIA]]]:
+        # Each connected component goes to the reference footprint closest to any of its points
+        # Returns (reference, tracks, vias) for references that got at least one component, in ref_fps order
+        # There are only a few references, a plain scan over them is all that's needed
+        refs_pos = [(ref_fp.GetX(), ref_fp.GetY()) for ref_fp in ref_fps]
+        assigned: list[tuple[dict[str, pcbnew.PCB_TRACK], dict[str, pcbnew.PCB_VIA]]] = [({}, {}) for _ in ref_fps]
+
+        for tracks, vias in self.get_track_components(tracks_by_uuid, vias_by_uuid):
+            points = [(via.GetX(), via.GetY()) for via in vias.values()]
+            for track in tracks.values():
+                points.append((track.GetX(), track.GetY()))
+                points.append((track.GetEndX(), track.GetEndY()))
+            best: Union[tuple[float, int], None] = None  # (squared distance, reference index)
+            for x, y in points:
+                for idx, (ref_x, ref_y) in enumerate(refs_pos):
+                    dist_sq = float(x - ref_x) ** 2 + float(y - ref_y) ** 2
+                    if best is None or dist_sq < best[0]:
+                        best = (dist_sq, idx)
+            ref_idx = 0 if best is None else best[1]
+            assigned[ref_idx][0].update(tracks)
+            assigned[ref_idx][1].update(vias)
+
+        return [(ref_fps[idx], tracks, vias) for idx, (tracks, vias) in enumerate(assigned) if len(tracks) != 0 or len(vias) != 0]
+
+    def find_mirror_counterpart(self, ref_fp: pcbnew.FOOTPRINT, footprints: list[pcbnew.FOOTPRINT]) -> Union[tuple[pcbnew.FOOTPRINT, bool], None]:
+        # Ergogen mirrors points across a vertical axis, so the counterpart of a footprint has the same footprint id and y,
+        # and the opposite orientation. Footprints of that row (either orientation, either board side) pair up from the
+        # outside in, as they would around the axis. A counterpart on the other board side (flipped) swaps layers
+        # Returns (counterpart, swap_layers)
+        def same_angle(angle1: float, angle2: float) -> bool:
+            diff = (angle1 - angle2) % 360
+            return min(diff, 360 - diff) <= MIRROR_ANGLE_TOLERANCE
+
+        orientation = ref_fp.GetOrientationDegrees()
+        row = [fp for fp in footprints
+               if fp.GetFPIDAsString() == ref_fp.GetFPIDAsString() and abs(fp.GetY() - ref_fp.GetY()) <= MIRROR_POS_TOLERANCE
+               and (same_angle(fp.GetOrientationDegrees(), orientation) or same_angle(fp.GetOrientationDegrees(), -orientation))]
+        row.sort(key=lambda fp: fp.GetX())
+        ref_uuid = ref_fp.m_Uuid.AsString()
+        idx = next(idx for idx, fp in enumerate(row) if fp.m_Uuid.AsString() == ref_uuid)
+        counterpart = row[len(row) - 1 - idx]
+        if counterpart.m_Uuid.AsString() == ref_uuid or not same_angle(counterpart.GetOrientationDegrees(), -orientation) \
+                or abs(counterpart.GetX() - ref_fp.GetX()) <= MIRROR_POS_TOLERANCE:
+            return None
+        return (counterpart, counterpart.IsFlipped() != ref_fp.IsFlipped())
+
+    def process_tracks_cached(self,
+                              tracks_by_uuid: dict[str, pcbnew.PCB_TRACK],
+                              vias_by_uuid: dict[str, pcbnew.PCB_VIA],
+                              ref_x,
+                              ref_y,
+                              orientation: float,
+                              place_nets: bool = True,
+                              nets_map: dict[str, str] = {},
+                              mirror: bool = False,
+                              swap_layers: bool = False) -> list[str]:
+        # Without a cache this is just process_tracks, routes in walk order. With a cache, tracks are processed per connected component,
+        # the routes of components whose geometry, nets and reference didn't change are reused, and routes are returned sorted so
+        # the output doesn't depend on which components were reused
+        if self.component_cache is None:
+            return self.process_tracks(tracks_by_uuid, vias_by_uuid, ref_x, ref_y, orientation, place_nets, nets_map, mirror, swap_layers)
+
+        options_key = (ref_x, ref_y, orientation, place_nets, tuple(sorted(nets_map.items())), mirror, swap_layers)
+        routes: list[str] = []
+        for tracks, vias in self.get_track_components(tracks_by_uuid, vias_by_uuid):
+            key = (options_key,
+                   tuple(sorted((track.GetX(), track.GetY(), track.GetEndX(), track.GetEndY(), track.GetLayerName(), track.GetNetname(),
+                                 track_mid(track)) for track in tracks.values())),
+                   tuple(sorted((via.GetX(), via.GetY(), via.GetNetname()) for via in vias.values())))
+            component_routes = self.component_cache.get(key)
+            if component_routes is None:
+                component_routes = self.process_tracks(tracks, vias, ref_x, ref_y, orientation, place_nets, nets_map, mirror, swap_layers)
+            self.next_component_cache[key] = component_routes
+            routes.extend(component_routes)
+        return sorted(routes)
+
     def get_footprints_tracks(self, footprints: list[pcbnew.FOOTPRINT]) -> tuple[dict[str, pcbnew.PCB_TRACK], dict[str, pcbnew.PCB_VIA]]:
 
         def add_connected_tracks(item: pcbnew.BOARD_CONNECTED_ITEM):
@@ -196,7 +703,7 @@ class RouterGen:
                 return
             if item.GetTypeDesc() == 'Pad':
                 pads_by_uuid[item_uuid] = item.Cast()
-            elif item.GetTypeDesc() == 'Track':
+            elif item.GetTypeDesc() in TRACK_TYPES:
                 tracks_by_uuid[item_uuid] = item.Cast()
             elif item.GetTypeDesc() == 'Via':
                 vias_by_uuid[item_uuid] = item.Cast()
@@ -230,7 +737,11 @@ class RouterGen:
                        ref_y,
                        orientation: float,
                        place_nets: bool = True,
-                       nets_map: dict[str, str] = {}):
+                       nets_map: dict[str, str] = {},
+                       mirror: bool = False,
+                       swap_layers: bool = False):
+        # With mirror, routes are generated in the frame of the footprint's mirrored counterpart: local x is negated and,
+        # with swap_layers, F and B are swapped (see RouteTransform)
 
         def get_tracks_by_pos() -> tuple[dict[tuple[int, int], list[pcbnew.PCB_TRACK]], dict[tuple[int, int], list[pcbnew.PCB_VIA]]]:
             tracks_by_pos: dict[tuple[int, int], list[pcbnew.PCB_TRACK]] = defaultdict(list)  # noqa: E501
@@ -238,7 +749,7 @@ class RouterGen:
             for track in tracks_by_uuid.values():
                 track_start = (track.GetX(), track.GetY())
                 track_end = (track.GetEndX(), track.GetEndY())
-                if track.GetTypeDesc() == 'Track':
+                if track.GetTypeDesc() in TRACK_TYPES:
                     tracks_by_pos[track_start].append(track.Cast())
                     if track_end != track_start:
                         tracks_by_pos[track_end].append(track.Cast())
@@ -361,9 +872,7 @@ class RouterGen:
                 curr_layer = None
                 started_new_route = True
 
-            def route_set_pos_cmd(pos: tuple[int, int]):
-                nonlocal curr_route
-                nonlocal curr_pos
+            def route_pos(pos: tuple[int, int]) -> str:
                 adjusted_x = decimal.Decimal(pos[0] - ref_x) / 1000000
                 adjusted_y = decimal.Decimal(pos[1] - ref_y) / 1000000
 
@@ -374,20 +883,36 @@ class RouterGen:
                     oriented_y = adjusted_x*sin + adjusted_y*cos
                     adjusted_x = oriented_x
                     adjusted_y = oriented_y
+                if mirror:
+                    adjusted_x = 0 - adjusted_x  # unlike -adjusted_x, keeps 0 from turning into -0
 
                 adjusted_x = round(adjusted_x, 5).normalize()
                 adjusted_y = round(adjusted_y,5).normalize()
 
-                logger.debug(f'Adding position ({str(adjusted_x)},{str(adjusted_y)})')
-                curr_route += f'({(adjusted_x)},{(adjusted_y)})'
+                return f'({(adjusted_x)},{(adjusted_y)})'
+
+            def route_set_pos_cmd(pos: tuple[int, int]):
+                nonlocal curr_route
+                nonlocal curr_pos
+                pos_str = route_pos(pos)
+                logger.debug(f'Adding position {pos_str}')
+                curr_route += pos_str
                 curr_pos = pos
 
+            def route_set_arc_cmd(mid: tuple[int, int]):
+                # Arc mid point, must be followed by the arc end position
+                nonlocal curr_route
+                mid_str = route_pos(mid)
+                logger.debug(f'Adding arc mid point {mid_str}')
+                curr_route += 'A' + mid_str
+
             def route_set_layer_cmd(layer: str):
                 assert layer == 'F' or layer == 'B', f'Layer can be either B or F and received "{str}" instead'
                 nonlocal curr_route
                 nonlocal curr_layer
                 logger.debug(f'Switching layer {curr_layer} -> {layer}')
-                curr_route += layer
+                # curr_layer stays the board layer, only the route is written in the mirrored frame
+                curr_route += {'F': 'B', 'B': 'F'}[layer] if swap_layers else layer
                 curr_layer = layer
 
             def get_mapped_net(net_name:str) -> Union[str, None]:
@@ -483,7 +1008,7 @@ class RouterGen:
             
             # Start handling the Track case
 
-            assert track_type == 'Track', f'PCB(Track) Items of type {track_type} are not supported'
+            assert track_type in TRACK_TYPES, f'PCB(Track) Items of type {track_type} are not supported'
 
             processed_tracks[track_uuid] = track # mark it already as processed in case of recursion through via
 
@@ -589,6 +1114,10 @@ class RouterGen:
                 route_set_layer_cmd(track_layer)
 
             # Now complete the second endpoint of the track (the one that isn't cur_pos), need an accurate check, no tolerances
+            # An arc passes through the same mid point whichever end it is walked from
+            track_mid_pos = track_mid(track)
+            if track_mid_pos is not None:
+                route_set_arc_cmd(track_mid_pos)
             if track_start_pos == curr_pos:
                 route_set_pos_cmd(track_end_pos)
             elif track_end_pos == curr_pos:
@@ -618,7 +1147,7 @@ class RouterGen:
 
             for connected_track in connected_tracks:
                 track_type = connected_track.GetTypeDesc()
-                if track_type == 'Track' and track_finish_pos and pos_on_either_track_endpoint(track_finish_pos, connected_track):
+                if track_type in TRACK_TYPES and track_finish_pos and pos_on_either_track_endpoint(track_finish_pos, connected_track):
                     process_track(connected_track, track_finish_pos)
 
             # Now process connected tracks/vias that we can connect to through pad, only if they are all on the exact position
@@ -636,7 +1165,7 @@ class RouterGen:
 
                     for pad_connected_track in pad_connected_tracks:
                         track_type = pad_connected_track.GetTypeDesc()
-                        if track_type == 'Track' and track_finish_pos and pos_on_either_track_endpoint(track_finish_pos, pad_connected_track):
+                        if track_type in TRACK_TYPES and track_finish_pos and pos_on_either_track_endpoint(track_finish_pos, pad_connected_track):
                             process_track(pad_connected_track, track_finish_pos)
 
 
@@ -0,0 +1,282 @@
+from typing import Any, Union
+import gzip
+import json
+import time
+from .items import ItemList, ItemUuid
+from .router_gen import RouterGen
+from .helper import get_logger
+logger = get_logger(__name__)
+
+# Record/replay of the inputs of RouterGen.get_selection_router_config, so generation issues seen on a user's board
+# can be reproduced, profiled and benchmarked offline without the board or a live KiCad session.
+#
+# A snapshot is a JSON lines file (gzipped if the file name ends with .gz), one record per line:
+#   {"k": "header", "version": 1, "options": {...get_selection_router_config keyword args...}}
+#   {"k": "item", "u": uuid, "t": type, ...geometry/net/layer...}   - every item the generator touched
+#   {"k": "selection", "u": [uuids]}
+#   {"k": "tracks" | "pads", "u": uuid, "c": [uuids]}              - answers to connectivity queries
+#
+# Recording wraps the connectivity the generator uses, so exactly the queries made during generation are captured.
+
+SNAPSHOT_VERSION = 1
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class SnapshotPoint:
+    # Stands in for VECTOR2I
+    x: int
+    y: int
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+
+class SnapshotItem:
+    # Offline replacement of the pcbnew items, implementing only what RouterGen uses
+    m_Uuid: ItemUuid
+    data: dict[str, Any]
+    snapshot: 'Snapshot'
+
+    def __init__(self, data: dict[str, Any], snapshot: 'Snapshot'):
+        self.m_Uuid = ItemUuid(data['u'])
+        self.data = data
+        self.snapshot = snapshot
+
+    def Cast(self):
+        return self
+
+    def GetTypeDesc(self) -> str:
+        return self.data['t']
+
+    def GetX(self) -> int:
+        return self.data['x']
+
+    def GetY(self) -> int:
+        return self.data['y']
+
+    def GetEndX(self) -> int:
+        return self.data.get('ex', self.data['x'])
+
+    def GetEndY(self) -> int:
+        return self.data.get('ey', self.data['y'])
+
+    def GetMid(self) -> SnapshotPoint:
+        return SnapshotPoint(self.data['mx'], self.data['my'])
+
+    def GetNetname(self) -> str:
+        return self.data.get('n', '')
+
+    def GetNetCode(self) -> int:
+        return self.data.get('nc', 0)
+
+    def GetLayerName(self) -> str:
+        return self.data.get('l', '')
+
+    def IsLocked(self) -> bool:
+        return self.data.get('lk', False)
+
+    def IsSelected(self) -> bool:
+        return self.m_Uuid.uuid in self.snapshot.selected
+
+    def GetReferenceAsString(self) -> str:
+        return self.data.get('r', '')
+
+    def GetOrientationDegrees(self) -> float:
+        return self.data.get('o', 0.0)
+
+    def GetFPIDAsString(self) -> str:
+        return self.data.get('id', '')
+
+    def IsFlipped(self) -> bool:
+        return self.data.get('fl', False)
+
+    def GetArea(self) -> float:
+        return self.data.get('a', 0.0)
+
+    def Pads(self) -> ItemList:
+        return ItemList(self.snapshot.items[uuid] for uuid in self.data.get('pads', []))
+
+    def GetParentFootprint(self) -> Union['SnapshotItem', None]:
+        parent = self.data.get('p')
+        return None if parent is None else self.snapshot.items[parent]
+
+
+class SnapshotConnectivity:
+    snapshot: 'Snapshot'
+
+    def __init__(self, snapshot: 'Snapshot'):
+        self.snapshot = snapshot
+
+    def _connected(self, queries: dict[str, list[str]], item) -> ItemList:
+        uuid = item.m_Uuid.AsString()
+        if uuid not in queries:
+            raise KeyError(f'Connectivity of item {uuid} was not recorded in the snapshot')
+        return ItemList(self.snapshot.items[connected] for connected in queries[uuid])
+
+    def GetConnectedTracks(self, item) -> ItemList:
+        return self._connected(self.snapshot.connected_tracks, item)
+
+    def GetConnectedPads(self, item) -> ItemList:
+        return self._connected(self.snapshot.connected_pads, item)
+
+
+class SnapshotBoard:
+    # Stands in for the board on replay, holds only the items the generator touched while recording
+    snapshot: 'Snapshot'
+
+    def __init__(self, snapshot: 'Snapshot'):
+        self.snapshot = snapshot
+
+    def GetConnectivity(self) -> SnapshotConnectivity:
+        return SnapshotConnectivity(self.snapshot)
+
+    def GetTracks(self) -> ItemList:
+        return ItemList(item for item in self.snapshot.items.values() if item.GetTypeDesc() in ('Track', 'Arc', 'Via'))
+
+    def GetFootprints(self) -> ItemList:
+        return ItemList(item for item in self.snapshot.items.values() if item.GetTypeDesc() == 'Footprint')
+
+
+class Snapshot:
+    options: dict[str, Any]
+    items: dict[str, SnapshotItem]
+    selection: list[SnapshotItem]
+    selected: set[str]
+    connected_tracks: dict[str, list[str]]
+    connected_pads: dict[str, list[str]]
+
+    def __init__(self):
+        self.options = {}
+        self.items = {}
+        self.selection = []
+        self.selected = set()
+        self.connected_tracks = {}
+        self.connected_pads = {}
+
+    @staticmethod
+    def load(path: str) -> 'Snapshot':
+        snapshot = Snapshot()
+        selection_uuids: list[str] = []
+        with _open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                kind = record['k']
+                if kind == 'header':
+                    if record['version'] != SNAPSHOT_VERSION:
+                        raise ValueError(f'Unsupported snapshot version {record["version"]}')
+                    snapshot.options = record['options']
+                elif kind == 'item':
+                    snapshot.items[record['u']] = SnapshotItem(record, snapshot)
+                elif kind == 'selection':
+                    selection_uuids = record['u']
+                elif kind == 'tracks':
+                    snapshot.connected_tracks[record['u']] = record['c']
+                elif kind == 'pads':
+                    snapshot.connected_pads[record['u']] = record['c']
+        snapshot.selection = [snapshot.items[uuid] for uuid in selection_uuids]
+        snapshot.selected = set(selection_uuids)
+        return snapshot
+
+    def get_router_gen(self) -> RouterGen:
+        return RouterGen(board=SnapshotBoard(self), selection=self.selection)  # pyright: ignore
+
+
+class RecordingConnectivity:
+    # Wraps the real connectivity, recording the items and answers of every query
+    connectivity: Any
+    items: dict[str, dict[str, Any]]
+    connected_tracks: dict[str, list[str]]
+    connected_pads: dict[str, list[str]]
+
+    def __init__(self, connectivity):
+        self.connectivity = connectivity
+        self.items = {}
+        self.connected_tracks = {}
+        self.connected_pads = {}
+
+    def add_item(self, item) -> str:
+        uuid = item.m_Uuid.AsString()
+        if uuid in self.items:
+            return uuid
+        item = item.Cast()
+        item_type = item.GetTypeDesc()
+        data: dict[str, Any] = {'k': 'item', 'u': uuid, 't': item_type, 'x': item.GetX(), 'y': item.GetY()}
+        self.items[uuid] = data
+        if item_type == 'Footprint':
+            data['r'] = item.GetReferenceAsString()
+            data['o'] = item.GetOrientationDegrees()
+            data['id'] = item.GetFPIDAsString()
+            data['fl'] = item.IsFlipped()
+            data['a'] = item.GetArea()
+            data['pads'] = [self.add_item(pad) for pad in item.Pads()]
+        elif item_type == 'Pad':
+            data['n'] = item.GetNetname()
+            data['nc'] = item.GetNetCode()
+            fp = item.GetParentFootprint()
+            if fp is not None:
+                data['p'] = self.add_item(fp)
+        elif item_type in ('Track', 'Arc', 'Via'):
+            data['ex'] = item.GetEndX()
+            data['ey'] = item.GetEndY()
+            if item_type == 'Arc':
+                mid = item.GetMid()
+                data['mx'] = mid.x
+                data['my'] = mid.y
+            data['n'] = item.GetNetname()
+            data['nc'] = item.GetNetCode()
+            data['l'] = item.GetLayerName()
+            data['lk'] = item.IsLocked()
+        return uuid
+
+    def _record(self, queries: dict[str, list[str]], item, connected):
+        queries[self.add_item(item)] = [self.add_item(connected_item) for connected_item in connected]
+        return connected
+
+    def GetConnectedTracks(self, item):
+        return self._record(self.connected_tracks, item, self.connectivity.GetConnectedTracks(item))
+
+    def GetConnectedPads(self, item):
+        return self._record(self.connected_pads, item, self.connectivity.GetConnectedPads(item))
+
+    def write(self, path: str, options: dict[str, Any], selection_uuids: list[str]):
+        with _open(path, 'w') as f:
+            f.write(json.dumps({'k': 'header', 'version': SNAPSHOT_VERSION, 'options': options}) + '\n')
+            for data in self.items.values():
+                f.write(json.dumps(data, separators=(',', ':')) + '\n')
+            f.write(json.dumps({'k': 'selection', 'u': selection_uuids}) + '\n')
+            for kind, queries in (('tracks', self.connected_tracks), ('pads', self.connected_pads)):
+                for uuid, connected in queries.items():
+                    f.write(json.dumps({'k': kind, 'u': uuid, 'c': connected}, separators=(',', ':')) + '\n')
+
+
+def record_selection_router_config(router_gen: RouterGen, path: str, **options) -> str:
+    # Runs get_selection_router_config(**options) on router_gen while recording its inputs into a snapshot file
+    recorder = RecordingConnectivity(router_gen.connectivity)
+    selection = [item for item in router_gen.get_current_selection()]
+    selection_uuids = [recorder.add_item(item) for item in selection]
+    router_gen.connectivity = recorder  # pyright: ignore
+    try:
+        result = router_gen.get_selection_router_config(**options)
+    finally:
+        router_gen.connectivity = recorder.connectivity
+    recorder.write(path, options, selection_uuids)
+    logger.info(f'Recorded snapshot with {len(recorder.items)} items to {path}')
+    return result
+
+
+def replay_snapshot(path: str, repeat: int = 1) -> tuple[str, list[float]]:
+    # Runs the generator on a recorded snapshot, returns the result and the duration of each run
+    snapshot = Snapshot.load(path)
+    result = ''
+    timings: list[float] = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = snapshot.get_router_gen().get_selection_router_config(**snapshot.options)
+        timings.append(time.perf_counter() - start_time)
+    return result, timings
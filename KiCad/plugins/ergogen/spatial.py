@@ -0,0 +1,40 @@
+from collections import defaultdict
+from typing import Generic, Iterator, TypeVar
+import math
+
+T = TypeVar('T')
+
+
+class GridIndex(Generic[T]):
+    # Uniform grid (spatial hash) over board coordinates, good enough for the point lookups we need on keyboard PCBs
+    # where items are spread evenly and queries are always local (tolerance sized or a few cells wide)
+    cell_size: float
+    cells: dict[tuple[int, int], list[tuple[float, float, T]]]
+
+    def __init__(self, cell_size: float):
+        assert cell_size > 0, 'Grid cell size must be positive'
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    def cell_of(self, x: float, y: float) -> tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, x: float, y: float, value: T):
+        self.cells[self.cell_of(x, y)].append((x, y, value))
+
+    def query(self, x: float, y: float, radius: float) -> Iterator[T]:
+        # Yields values stored at points within radius of (x, y)
+        min_cx, min_cy = self.cell_of(x - radius, y - radius)
+        max_cx, max_cy = self.cell_of(x + radius, y + radius)
+        radius_sq = radius * radius
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    continue
+                for px, py, value in cell:
+                    if (px - x) * (px - x) + (py - y) * (py - y) <= radius_sq:
+                        yield value
+
+    def __len__(self) -> int:
+        return sum(len(cell) for cell in self.cells.values())
@@ -0,0 +1,221 @@
+from typing import Any
+import math
+from .items import ItemList, ItemUuid, track_mid
+from .spatial import GridIndex
+from .helper import get_logger
+logger = get_logger(__name__)
+
+# Pre-generation cleanup of the tracks/vias routes are generated from. Hand routed boards often have stacked duplicate
+# vias, duplicate tracks and colinear tracks overlapping each other, which would otherwise be walked and emitted as
+# redundant route points or extra routes. Only the working set is changed, never the board:
+# - duplicate vias (same net, same position) and duplicate tracks (same net, layer and endpoints) are dropped
+# - overlapping colinear straight tracks on the same net and layer are replaced by a single MergedTrack spanning them
+# CleanupConnectivity then stands in for the board connectivity so the generator only ever sees the remaining items.
+
+DEFAULT_TOLERANCE = 1000  # 1um, in KiCad internal units
+
+
+class MergedTrack:
+    # Straight track replacing overlapping colinear tracks, implements what the generator uses of PCB_TRACK
+    m_Uuid: ItemUuid
+    sources: list[Any]
+    start: tuple[int, int]
+    end: tuple[int, int]
+
+    def __init__(self, sources: list, start: tuple[int, int], end: tuple[int, int]):
+        self.m_Uuid = ItemUuid('merged-' + sources[0].m_Uuid.AsString())
+        self.sources = sources
+        self.start = start
+        self.end = end
+
+    def Cast(self):
+        return self
+
+    def GetTypeDesc(self) -> str:
+        return 'Track'
+
+    def GetX(self) -> int:
+        return self.start[0]
+
+    def GetY(self) -> int:
+        return self.start[1]
+
+    def GetEndX(self) -> int:
+        return self.end[0]
+
+    def GetEndY(self) -> int:
+        return self.end[1]
+
+    def GetNetname(self) -> str:
+        return self.sources[0].GetNetname()
+
+    def GetNetCode(self) -> int:
+        return self.sources[0].GetNetCode()
+
+    def GetLayerName(self) -> str:
+        return self.sources[0].GetLayerName()
+
+    def IsLocked(self) -> bool:
+        return all(source.IsLocked() for source in self.sources)
+
+
+class CleanupResult:
+    tracks: dict[str, Any]
+    vias: dict[str, Any]
+    replaced: dict[str, Any]  # uuid of a removed item -> item standing in for it
+    duplicate_vias: int
+    duplicate_tracks: int
+    merged_tracks: int  # tracks replaced by MergedTracks
+
+    def __init__(self):
+        self.tracks = {}
+        self.vias = {}
+        self.replaced = {}
+        self.duplicate_vias = 0
+        self.duplicate_tracks = 0
+        self.merged_tracks = 0
+
+    def has_changes(self) -> bool:
+        return len(self.replaced) != 0
+
+    def summary(self) -> str:
+        return (f'Cleanup: {self.duplicate_vias} duplicate vias and {self.duplicate_tracks} duplicate tracks removed, '
+                f'{self.merged_tracks} overlapping tracks merged')
+
+
+def cleanup_tracks(tracks_by_uuid: dict[str, Any], vias_by_uuid: dict[str, Any], tolerance: int = DEFAULT_TOLERANCE) -> CleanupResult:
+    result = CleanupResult()
+
+    # Duplicate vias
+    vias_index: GridIndex[Any] = GridIndex(max(tolerance * 4, 1000))
+    for uuid, via in vias_by_uuid.items():
+        duplicate = next((kept for kept in vias_index.query(via.GetX(), via.GetY(), tolerance) if kept.GetNetname() == via.GetNetname()), None)
+        if duplicate is not None:
+            result.replaced[uuid] = duplicate
+            result.duplicate_vias += 1
+            continue
+        vias_index.insert(via.GetX(), via.GetY(), via)
+        result.vias[uuid] = via
+
+    # Exact duplicate tracks, endpoints in either order
+    kept_by_key: dict[tuple, Any] = {}
+    straight: dict[tuple[str, str], list[Any]] = {}  # (net, layer) -> straight, non zero length tracks
+    for uuid, track in tracks_by_uuid.items():
+        start = (track.GetX(), track.GetY())
+        end = (track.GetEndX(), track.GetEndY())
+        key = (track.GetNetname(), track.GetLayerName(), min(start, end), max(start, end), track_mid(track))
+        if key in kept_by_key:
+            result.replaced[uuid] = kept_by_key[key]
+            result.duplicate_tracks += 1
+            continue
+        kept_by_key[key] = track
+        result.tracks[uuid] = track
+        if track.GetTypeDesc() == 'Track' and start != end:
+            straight.setdefault((key[0], key[1]), []).append(track)
+
+    # Overlapping colinear tracks
+    for tracks in straight.values():
+        for group in _overlapping_groups(tracks, tolerance):
+            merged = _merge(group)
+            for track in group:
+                uuid = track.m_Uuid.AsString()
+                del result.tracks[uuid]
+                result.replaced[uuid] = merged
+            result.tracks[merged.m_Uuid.AsString()] = merged
+            result.merged_tracks += len(group)
+
+    # Items replaced by a duplicate that was merged in turn
+    for uuid, item in result.replaced.items():
+        result.replaced[uuid] = result.replaced.get(item.m_Uuid.AsString(), item)
+    if result.has_changes():
+        logger.debug(result.summary())
+    return result
+
+
+def _overlapping_groups(tracks: list, tolerance: int) -> list[list]:
+    # Groups of two or more colinear tracks connected by overlaps (sharing more than a point), union-find over track indices
+    parent = list(range(len(tracks)))
+
+    def find(idx: int) -> int:
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    endpoints_index: GridIndex[int] = GridIndex(1000000)  # 1mm cells
+    for idx, track in enumerate(tracks):
+        endpoints_index.insert(track.GetX(), track.GetY(), idx)
+        endpoints_index.insert(track.GetEndX(), track.GetEndY(), idx)
+
+    for idx, track in enumerate(tracks):
+        sx, sy, ex, ey = track.GetX(), track.GetY(), track.GetEndX(), track.GetEndY()
+        length = math.hypot(ex - sx, ey - sy)
+        dx, dy = (ex - sx) / length, (ey - sy) / length
+
+        def along(x: float, y: float) -> float:
+            return (x - sx) * dx + (y - sy) * dy
+
+        def off_line(x: float, y: float) -> float:
+            return abs((x - sx) * dy - (y - sy) * dx)
+
+        # Any track overlapping this one has an endpoint on it, or contains it and is found from the other side
+        for other_idx in set(endpoints_index.query((sx + ex) / 2, (sy + ey) / 2, length / 2 + tolerance)):
+            if other_idx == idx or find(other_idx) == find(idx):
+                continue
+            other = tracks[other_idx]
+            ox, oy, oex, oey = other.GetX(), other.GetY(), other.GetEndX(), other.GetEndY()
+            if off_line(ox, oy) > tolerance or off_line(oex, oey) > tolerance:
+                continue
+            o1, o2 = sorted((along(ox, oy), along(oex, oey)))
+            if min(length, o2) - max(0.0, o1) > tolerance:
+                parent[find(other_idx)] = find(idx)
+
+    groups: dict[int, list] = {}
+    for idx, track in enumerate(tracks):
+        groups.setdefault(find(idx), []).append(track)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def _merge(group: list) -> MergedTrack:
+    # Spans the extreme endpoints along the group's direction, keeping their exact coordinates
+    first = group[0]
+    sx, sy = first.GetX(), first.GetY()
+    dx, dy = first.GetEndX() - sx, first.GetEndY() - sy
+    points = [(track.GetX(), track.GetY()) for track in group] + [(track.GetEndX(), track.GetEndY()) for track in group]
+    points.sort(key=lambda point: (point[0] - sx) * dx + (point[1] - sy) * dy)
+    return MergedTrack(group, points[0], points[-1])
+
+
+class CleanupConnectivity:
+    # Wraps the board connectivity, answering in terms of the cleaned up items: removed items are replaced by the item
+    # standing in for them, and a MergedTrack is connected to whatever its source tracks are connected to
+    connectivity: Any
+    result: CleanupResult
+
+    def __init__(self, connectivity, result: CleanupResult):
+        self.connectivity = connectivity
+        self.result = result
+
+    def _sources(self, item) -> list:
+        return item.sources if isinstance(item, MergedTrack) else [item]
+
+    def GetConnectedTracks(self, item) -> ItemList:
+        sources = self._sources(item)
+        excluded = set(source.m_Uuid.AsString() for source in sources)
+        excluded.add(item.m_Uuid.AsString())
+        connected: dict[str, Any] = {}
+        for source in sources:
+            for track in self.connectivity.GetConnectedTracks(source):
+                uuid = track.m_Uuid.AsString()
+                track = self.result.replaced.get(uuid, track)
+                uuid = track.m_Uuid.AsString()
+                if uuid not in excluded:
+                    connected.setdefault(uuid, track)
+        return ItemList(connected.values())
+
+    def GetConnectedPads(self, item) -> ItemList:
+        connected: dict[str, Any] = {}
+        for source in self._sources(item):
+            for pad in self.connectivity.GetConnectedPads(source):
+                connected.setdefault(pad.m_Uuid.AsString(), pad)
+        return ItemList(connected.values())
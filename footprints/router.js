@@ -1,5 +1,5 @@
 // Router Footprint for ErgoGen
-// Version: 1.0
+// Version: 1.4
 // Designed and Implemented by @yanshay
 // https://github.com/yanshay/ergogen-stuff 
 // This file is under /blob/main/footprints/router.js
@@ -13,9 +13,12 @@ module.exports = {
     width: { type: "number", value: 0.25 },
     route: { type: "string", value: "" },
     routes: { type: "array", value: [] },
+    compact_routes: { type: "array", value: [] },
     via_size: { type: "number", value: 0.8 },
     via_drill: { type: "number", value: 0.4 },
     locked: false,
+    mirror: false,
+    mirror_layers: false,
   },
 
   body: (p) => {
@@ -33,20 +36,28 @@ module.exports = {
       }
     }
 
-    const adjust_point = (x, y) => {
-      const at_l = get_at_coordinates()
-      if (at_l == null) {
-        throw new Error(`Could not get x and y coordinates from p.at: ${p.at}`)
-      }
-      const at_x = at_l[0]
-      const at_y = at_l[1]
-      const at_angle = at_l[2]
+    // Placement is the same for all points of this instance, parse it and compute the rotation once
+    const at_l = get_at_coordinates()
+    if (at_l == null) {
+      throw new Error(`Could not get x and y coordinates from p.at: ${p.at}`)
+    }
+    const at_x = at_l[0]
+    const at_y = at_l[1]
+    const at_radians = (Math.PI / 180) * at_l[2]
+    const at_cos = Math.cos(at_radians)
+    const at_sin = Math.sin(at_radians)
+
+    // With mirror, routes are given in the frame of the unmirrored footprints and are mirrored (x negated) on Ergogen
+    // mirrored points, so one block serves both halves of a split board. With mirror_layers F and B are swapped there too
+    const mirrored = p.mirror && p.point && p.point.meta && p.point.meta.mirrored ? true : false
+    const x_sign = mirrored ? -1 : 1
+    const front_layer = mirrored && p.mirror_layers ? "B.Cu" : "F.Cu"
+    const back_layer = mirrored && p.mirror_layers ? "F.Cu" : "B.Cu"
 
-      const radians = (Math.PI / 180) * at_angle,
-        cos = Math.cos(radians),
-        sin = Math.sin(radians),
-        nx = cos * x + sin * y + at_x,
-        ny = cos * y - sin * x + at_y
+    const adjust_point = (x, y) => {
+      x = x_sign * x
+      const nx = at_cos * x + at_sin * y + at_x,
+        ny = at_cos * y - at_sin * x + at_y
 
       const point_str = `${nx.toFixed(5)/1} ${ny.toFixed(5)/1}` // the division by 1 is to remove trailing zeros
       return point_str
@@ -67,6 +78,33 @@ module.exports = {
       }) (layer ${layer}) (net ${net}))`
     }
 
+    // (arc (start 108.8 108) (mid 109.1 108.4) (end 109.7 108) (width 0.2) (layer "F.Cu") (net 0))
+    const get_arc = (start, mid, end, layer, net) => {
+      if (!layer) {
+        throw new Error(
+          "Can't place arc before layer is set, use 'f' or 'b', to set starting layer"
+        )
+      }
+      return `(arc ${locked}(start ${adjust_point(
+        start[0],
+        start[1]
+      )}) (mid ${adjust_point(mid[0], mid[1])}) (end ${adjust_point(
+        end[0],
+        end[1]
+      )}) (width ${p.width}) (layer ${layer}) (net ${net}))`
+    }
+
+    // Segment or, when an arc mid point was given, arc from start to end
+    const get_track = (start, mid, end, layer, net) => {
+      return mid ? get_arc(start, mid, end, layer, net) : get_segment(start, end, layer, net)
+    }
+
+    const check_no_pending_arc = (mid, route) => {
+      if (mid) {
+        throw new Error(`Arc mid point must be followed by the arc end position in ${route}`)
+      }
+    }
+
     // (via (at 108.8 108) (size 0.8) (drill 0.4) (layers "F.Cu" "B.Cu") (net 0))
     const get_via = (pos, net) => {
       if (!pos) {
@@ -82,28 +120,32 @@ module.exports = {
     const parse_tuple = (t) => {
       let str_tuple = JSON.parse(t.replace(/\(/g, "[").replace(/\)/g, "]"))
       let num_tuple = str_tuple.map((v) => Number(v))
-      if (isNaN(num_tuple[0] || isNaN(num_tuple[1]))) {
+      if (isNaN(num_tuple[0]) || isNaN(num_tuple[1])) {
         throw new Error(`Invalid position encountered: ${str_tuple}`)
       }
       return num_tuple
     }
 
-    const get_traces = (route, net) => {
-      let traces = ""
+    // Appends the traces of the route to the traces array, joined once at the end
+    const get_traces = (route, net, traces) => {
       let layer = undefined
       let start = undefined // [x, y]
+      let mid = undefined // [x, y] of a pending arc
 
       for (let i = 0; i < route.length; i++) {
-        ch = route[i].toLowerCase()
+        const ch = route[i].toLowerCase()
+        if (ch != "(") {
+          check_no_pending_arc(mid, route)
+        }
         switch (ch) {
           case "f":
-            layer = "F.Cu"
+            layer = front_layer
             break
           case "b":
-            layer = "B.Cu"
+            layer = back_layer
             break
           case "v":
-            traces = traces + get_via(start, net) + "\n"
+            traces.push(get_via(start, net))
             switch (layer) {
               case "F.Cu":
                 layer = "B.Cu"
@@ -114,42 +156,49 @@ module.exports = {
             }
             break
           case "(":
-            let tuple_str = "("
             let parenthesis_idx = i
-            for (i = i + 1; i < route.length; i++) {
-              let ch = route[i]
-              tuple_str += ch
-              if (route[i] == ")") {
-                break
-              }
-              if (i > route.length) {
-                throw new Error(
-                  `Unclosed position parenthesis in ${route} at character position ${parenthesis_idx}`
-                )
-              }
+            i = route.indexOf(")", i)
+            if (i == -1) {
+              throw new Error(
+                `Unclosed position parenthesis in ${route} at character position ${parenthesis_idx}`
+              )
             }
-            let pos = parse_tuple(tuple_str)
+            let pos = parse_tuple(route.substring(parenthesis_idx, i + 1))
             if (start) {
-              traces = traces + get_segment(start, pos, layer, net) + "\n"
+              traces.push(get_track(start, mid, pos, layer, net))
             }
             start = pos
+            mid = undefined
+            break
+          case "a":
+            let arc_idx = i
+            if (route[i + 1] != "(") {
+              throw new Error(
+                `Arc command must be followed by its mid point position in ${route} at character position ${arc_idx}`
+              )
+            }
+            if (!start) {
+              throw new Error(
+                "Can't place arc when position is not set, use (x,y) to set position"
+              )
+            }
+            i = route.indexOf(")", i)
+            if (i == -1) {
+              throw new Error(
+                `Unclosed position parenthesis in ${route} at character position ${arc_idx + 1}`
+              )
+            }
+            mid = parse_tuple(route.substring(arc_idx + 1, i + 1))
             break
           case "<":
-            let net_name = ""
             let lt_idx = i
-            for (i = i + 1; i < route.length; i++) {
-              let ch = route[i]
-              if (route[i] == ">") {
-                break
-              }
-              net_name += ch
-              if (i > route.length) {
-                throw new Error(
-                  `Unclosed net parenthesis in ${route} at character position ${lt_idx}`
-                )
-              }
+            i = route.indexOf(">", i)
+            if (i == -1) {
+              throw new Error(
+                `Unclosed net parenthesis in ${route} at character position ${lt_idx}`
+              )
             }
-            net = p.global_net(net_name)
+            net = p.global_net(route.substring(lt_idx + 1, i))
           case "x":
           case "|":
             start = undefined
@@ -158,26 +207,97 @@ module.exports = {
             throw new Error(`Unsupported character '${ch}' at position ${i}.`)
         }
       }
+      check_no_pending_arc(mid, route)
 
       return traces
     }
 
-    const get_routes_traces = (routes, net) => {
-      let routes_traces = routes.reduce((acc_traces, route) => {
-        return acc_traces + get_traces(route, net)
-      }, "")
-      return routes_traces
+    // Pre-parsed routes as generated by the KiCad plugin: [opcodes, args...]
+    // opcodes are f/b/v/x as in route strings, 'p' takes the next two args as a position, 'a' as an arc mid point
+    // and 'n' the next arg as a net name
+    const get_compact_traces = (compact, net, traces) => {
+      const ops = compact[0]
+      let layer = undefined
+      let start = undefined // [x, y]
+      let mid = undefined // [x, y] of a pending arc
+      let k = 1
+
+      for (let i = 0; i < ops.length; i++) {
+        if (ops[i] != "p") {
+          check_no_pending_arc(mid, compact)
+        }
+        switch (ops[i]) {
+          case "f":
+            layer = front_layer
+            break
+          case "b":
+            layer = back_layer
+            break
+          case "v":
+            traces.push(get_via(start, net))
+            layer = layer == "F.Cu" ? "B.Cu" : layer == "B.Cu" ? "F.Cu" : layer
+            break
+          case "p":
+            if (k + 1 >= compact.length) {
+              throw new Error(`Missing position arguments in compact route ${compact}`)
+            }
+            const pos = [compact[k], compact[k + 1]]
+            k += 2
+            if (start) {
+              traces.push(get_track(start, mid, pos, layer, net))
+            }
+            start = pos
+            mid = undefined
+            break
+          case "a":
+            if (k + 1 >= compact.length) {
+              throw new Error(`Missing arc mid point arguments in compact route ${compact}`)
+            }
+            if (!start) {
+              throw new Error(
+                "Can't place arc when position is not set, use (x,y) to set position"
+              )
+            }
+            mid = [compact[k], compact[k + 1]]
+            k += 2
+            break
+          case "n":
+            net = p.global_net(compact[k++])
+            start = undefined
+            break
+          case "x":
+            start = undefined
+            break
+          default:
+            throw new Error(`Unsupported opcode '${ops[i]}' in compact route ${compact}`)
+        }
+      }
+      check_no_pending_arc(mid, compact)
+
+      return traces
     }
 
-    let combined_traces = ""
+    const get_routes_traces = (routes, net, traces) => {
+      for (const route of routes) {
+        get_traces(route, net, traces)
+      }
+      return traces
+    }
+
+    let traces = []
     let locked = p.locked ? 'locked ' : ''
     if (p.route) {
-      combined_traces += get_traces(p.route, p.net.index)
+      get_traces(p.route, p.net.index, traces)
     }
     if (p.routes) {
-      combined_traces += get_routes_traces(p.routes, p.net.index)
+      get_routes_traces(p.routes, p.net.index, traces)
+    }
+    if (p.compact_routes) {
+      for (const compact of p.compact_routes) {
+        get_compact_traces(compact, p.net.index, traces)
+      }
     }
 
-    return combined_traces
+    return traces.length ? traces.join("\n") + "\n" : ""
   },
 }
@@ -0,0 +1,8 @@
+import pathlib
+import sys
+
+# The plugin is a package inside KiCad's plugins folder, import it as KiCad does
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.joinpath('KiCad', 'plugins')))
+
+# Before any test imports pcbnew, as the command line does, so the package doesn't register the action plugin (see __init__.py)
+import ergogen  # noqa: E402,F401
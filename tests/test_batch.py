@@ -0,0 +1,52 @@
+import json
+import pytest
+
+pytest.importorskip('pcbnew')  # batch runs extractions through headless, which needs KiCad's python
+
+from ergogen.batch import cache_key, load_batch  # noqa: E402
+
+
+@pytest.fixture
+def batch_file(tmp_path):
+    tmp_path.joinpath('a.kicad_pcb').write_text('(kicad_pcb a)')
+    tmp_path.joinpath('b.kicad_pcb').write_text('(kicad_pcb b)')
+    tmp_path.joinpath('config.yaml').write_text('routes:\n  what: router\n')
+    path = tmp_path.joinpath('batch.json')
+    path.write_text(json.dumps({'defaults': {'ref_fp_name': 'SW1', 'diff_config_path': 'config.yaml'},
+                                'boards': [{'board': 'a.kicad_pcb'}, {'board': 'b.kicad_pcb', 'output': 'b.yaml', 'footprints': ['SW*']}]}))
+    return path
+
+
+def test_load_batch(batch_file):
+    a, b = load_batch(str(batch_file))
+    base = batch_file.parent
+    assert (a.board, a.output, a.options.footprints) == (str(base / 'a.kicad_pcb'), str(base / 'a.routes.yaml'), ['SW1'])
+    assert (b.output, b.options.footprints) == (str(base / 'b.yaml'), ['SW*'])
+    assert a.options.router_config == {'ref_fp_name': 'SW1', 'diff_config_path': str(base / 'config.yaml'), 'nets_map': {},
+                                       'include_locked_tracks_vias': False}
+
+
+def test_load_batch_invalid(tmp_path):
+    path = tmp_path.joinpath('batch.json')
+    path.write_text(json.dumps({'boards': [{'board': 'a.kicad_pcb'}]}))
+    with pytest.raises(ValueError):
+        load_batch(str(path))
+
+
+def test_cache_key(batch_file):
+    a, b = load_batch(str(batch_file))
+    key = cache_key(a)
+    assert cache_key(load_batch(str(batch_file))[0]) == key
+    assert cache_key(b) != key
+
+    a.options.router_config['compact'] = True
+    assert cache_key(a) != key
+    del a.options.router_config['compact']
+    assert cache_key(a) == key
+
+    batch_file.parent.joinpath('config.yaml').write_text('routes:\n  what: router\n  where: true\n')
+    assert cache_key(a) != key
+
+    key = cache_key(a)
+    batch_file.parent.joinpath('a.kicad_pcb').write_text('(kicad_pcb a changed)')
+    assert cache_key(a) != key
@@ -0,0 +1,47 @@
+from ergogen.config_diff import block_route_lines, canonical_route_key, diff_router_routes
+from ergogen.router_config import RouterBlock
+
+
+def test_key_reversed_route():
+    assert canonical_route_key('f(0,0)(1,0)(1,1)') == canonical_route_key('f(1,1)(1,0)(0,0)')
+    assert canonical_route_key('f(0,0)a(1,1)(2,0)') == canonical_route_key('f(2,0)a(1,1)(0,0)')
+    assert canonical_route_key('f(0,0)(1,0)v(1,1)') == canonical_route_key('b(1,1)(1,0)v(0,0)f') != canonical_route_key('f(0,0)(1,0)(1,1)')
+
+
+def test_key_rounding_and_nets():
+    assert canonical_route_key('f(0,0)(1,0)') == canonical_route_key('f(-0.0001,0.0002)(1.0004,0)')
+    assert canonical_route_key('f(0,0)(1,0)') != canonical_route_key('f(0,0)(1.01,0)')
+    assert canonical_route_key('<GND>f(0,0)(1,0)') == canonical_route_key('<!GND>f(0,0)(1,0)') != canonical_route_key('f(0,0)(1,0)')
+
+
+def test_diff():
+    existing = ['"f(0,0)(1,0)(1,1)"', '"f(5,5)(6,5)"', '"b(9,9)(9,8)"']
+    generated = ['"f(1,1)(1,0)(0,0)" # reversed', '"f(5,5)(6,6)"', '"f(20,20)(21,20)"']
+    diff = diff_router_routes(existing, generated)
+    assert diff.has_changes()
+    assert diff.unchanged == [existing[0]]
+    assert diff.changed == [(existing[1], generated[1])]  # shares an endpoint
+    assert diff.removed == [existing[2]]
+    assert diff.added == [generated[2]]
+    assert diff.merged == [existing[0], generated[1], generated[2]]
+    assert diff.summary()[0] == '1 unchanged, 1 added, 1 removed, 1 changed'
+
+
+def test_diff_reordered():
+    routes = ['"f(0,0)(1,0)"', '"b(2,2)(3,3)"', '"f(0,0)(1,0)"']
+    diff = diff_router_routes(routes, ['"b(3,3)(2,2)"', '"f(1,0)(0,0)"', '"f(0,0)(1,0)"'])
+    assert not diff.has_changes()
+    assert diff.merged == routes
+
+
+def test_diff_duplicates():
+    diff = diff_router_routes(['"f(0,0)(1,0)"', '"f(0,0)(1,0)"'], ['"f(0,0)(1,0)"'])
+    assert diff.unchanged == ['"f(0,0)(1,0)"']
+    assert diff.removed == ['"f(0,0)(1,0)"']
+
+
+def test_block_route_lines():
+    block = RouterBlock('routes')
+    block.routes = ['"f(0,0)(1,0)"']
+    block.compact_routes = [['fpp', 0, 0, 1, 0]]
+    assert block_route_lines(block) == ['"f(0,0)(1,0)"', '"F(0,0)(1,0)"']
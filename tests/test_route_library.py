@@ -0,0 +1,60 @@
+import json
+import pytest
+from ergogen.route_library import RouteLibrary, RouteTemplate, canonical_routes, template_key
+from ergogen.route_parser import RouteTransform
+
+# Switch with its diode, pad positions in the switch's local coordinates (mm)
+ARRANGEMENT = [('choc', '', 0, 0), ('choc', '1', 5, -3.8), ('choc', '2', 0, -5.9), ('diode', '', 8.25, 1.1), ('diode', '1', 7.4, 1.1),
+               ('diode', '2', 9.1, 1.1)]
+
+
+def placed_key(x: int, y: int, orientation: float) -> str:
+    # Key of the arrangement placed on the board at (x, y) rotated by orientation, computed back from board coordinates
+    # as RouterGen.get_selection_template_key does
+    transform = RouteTransform(x, y, orientation)
+    return template_key([(fpid, number, *transform.to_local(transform.to_board((px, py)))) for fpid, number, px, py in ARRANGEMENT])
+
+
+@pytest.mark.parametrize('x, y, orientation', [(0, 0, 0), (123456789, -98765432, 0), (50000000, 60000000, 90), (-3000000, 7000000, -17.5),
+                                               (1, 2, 180)])
+def test_key_stable_under_transform(x, y, orientation):
+    assert placed_key(x, y, orientation) == template_key(ARRANGEMENT)
+
+
+def test_key_order_independent():
+    assert template_key(list(reversed(ARRANGEMENT))) == template_key(ARRANGEMENT)
+
+
+def test_key_differs():
+    moved = [('diode', '2', 9.2, 1.1) if pad[:2] == ('diode', '2') else pad for pad in ARRANGEMENT]
+    assert template_key(moved) != template_key(ARRANGEMENT)
+    assert template_key([('mx', *pad[1:]) if pad[0] == 'choc' else pad for pad in ARRANGEMENT]) != template_key(ARRANGEMENT)
+
+
+def test_canonical_routes():
+    routes = ['"b(1,1)(2,2)"', ' "f(0,0)(1,0)" # net: GND', '"f(1,0)(0,0)"']
+    assert canonical_routes(routes) == canonical_routes(list(reversed(routes))[1:] + routes[:1])
+    assert len(canonical_routes(routes)) == 2
+
+
+def test_save_lookup(tmp_path):
+    key = template_key(ARRANGEMENT)
+    library = RouteLibrary(tmp_path)
+    assert library.lookup(key) is None
+    path = library.save(RouteTemplate(key, 'switch', ['choc', 'diode'], ['"f(1,0)(0,0)"', '"f(0,0)(1,0)"']))
+    assert path == tmp_path.joinpath(f'{key}.json')
+    assert json.loads(path.read_text())['routes'] == ['"f(1,0)(0,0)"']
+
+    template = RouteLibrary(tmp_path).lookup(key)
+    assert template is not None
+    assert (template.name, template.footprints, template.routes) == ('switch', ['choc', 'diode'], ['"f(1,0)(0,0)"'])
+
+
+def test_lookup_invalid(tmp_path):
+    tmp_path.joinpath('bad.json').write_text('{"version": 99}')
+    assert RouteLibrary(tmp_path).lookup('bad') is None
+
+
+def test_library_path_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('ERGOGEN_ROUTE_LIBRARY', str(tmp_path))
+    assert RouteLibrary().path == tmp_path
@@ -0,0 +1,124 @@
+import json
+import pytest
+from ergogen.route_parser import (RouteParseError, RouteTransform, compact_route, compact_route_tokens, expand_route, expand_routes, format_compact_route,
+                                  split_route_comment, tokenize_route, tokens_to_route)
+
+
+def test_tokenize():
+    assert tokenize_route('f(1,2.5)v(-1,0)|<GND>x') == [('f', None), ('p', (1.0, 2.5)), ('v', None), ('p', (-1.0, 0.0)), ('x', None),
+                                                       ('n', 'GND'), ('x', None)]
+
+
+@pytest.mark.parametrize('route', ['f(1,2', 'f(1)', 'f(a,b)', 'f<GND', 'fz'])
+def test_tokenize_invalid(route):
+    with pytest.raises(RouteParseError):
+        tokenize_route(route)
+
+
+def test_expand_layers_and_vias():
+    expanded = expand_route('f(0,0)(2,0)v(2,3)', 'GND')
+    assert [(s.start, s.end, s.layer, s.net) for s in expanded.segments] == [((0, 0), (2, 0), 'F', 'GND'), ((2, 0), (2, 3), 'B', 'GND')]
+    assert [(v.pos, v.net) for v in expanded.vias] == [((2, 0), 'GND')]
+
+
+def test_expand_net_and_new_route():
+    expanded = expand_route('f(0,0)(1,0)<VCC>(5,5)(6,5)x(7,7)(8,8)')
+    assert [(s.start, s.end, s.net) for s in expanded.segments] == [((0, 0), (1, 0), None), ((5, 5), (6, 5), 'VCC'), ((7, 7), (8, 8), 'VCC')]
+
+
+def test_expand_routes():
+    expanded = expand_routes(['- "f(0,0)(1,0)" # net: GND', "  - 'b(1,1)(2,2)v'"])
+    assert [(s.start, s.end, s.layer) for s in expanded.segments] == [((0, 0), (1, 0), 'F'), ((1, 1), (2, 2), 'B')]
+    assert [v.pos for v in expanded.vias] == [(2, 2)]
+
+
+@pytest.mark.parametrize('route', ['(0,0)(1,0)', 'fv'])
+def test_expand_invalid(route):
+    with pytest.raises(RouteParseError):
+        expand_route(route)
+
+
+def test_transform():
+    assert RouteTransform(1000000, 2000000, 0).to_board((1.5, -2)) == (2500000, 0)
+    assert RouteTransform(1000000, 2000000, 90).to_board((1, 0)) == (1000000, 1000000)
+    assert RouteTransform(1000000, 2000000, 180).to_board((1, 1)) == (0, 1000000)
+    assert RouteTransform(0, 0, 0).to_board((0.000004, 0)) == (0, 0)  # rounded to 5 decimals like router.js
+
+
+def test_compact_route():
+    assert compact_route('f(1,2)v(3,4)x<GND>') == ['fpvpxn', 1.0, 2.0, 3.0, 4.0, 'GND']
+    assert format_compact_route(['fp', 1.0, -0.000001]) == '["fp", 1, 0]'
+    assert format_compact_route(['n', 'a"b']) == '["n", "a\\"b"]'
+
+
+@pytest.mark.parametrize('route', ['F(0,0)(1.25,-3)V(1.25,4)', 'B(0,0)(2,0)x(5,5)F(6,6)', '<GND>F(0.00001,-0.5)(1,1)<VCC>B(2,2)(3,3)'])
+def test_compact_round_trip(route):
+    tokens = tokenize_route(route)
+    compact = compact_route(route)
+    assert compact_route_tokens(compact) == tokens
+    assert compact_route_tokens(json.loads(format_compact_route(compact))) == tokens  # written json compatible
+
+
+@pytest.mark.parametrize('compact', [[], [1.0], ['p', 1.0], ['n'], ['z']])
+def test_compact_route_invalid(compact):
+    with pytest.raises(RouteParseError):
+        compact_route_tokens(compact)
+
+
+def test_split_route_comment():
+    assert split_route_comment('- "f(0,0)(1,0)" # net: GND') == ('f(0,0)(1,0)', 'net: GND')
+    assert split_route_comment("  - f(0,0)(1,0) # net: GND") == ('f(0,0)(1,0)', 'net: GND')
+    assert split_route_comment('f(0,0)') == ('f(0,0)', '')
+    with pytest.raises(RouteParseError):
+        split_route_comment('"f(0,0)')
+
+
+@pytest.mark.parametrize('route', ['F(0,0)(1.25,-3)V(1.25,4)', 'B(0,0)(2,0)x(5,5)F(6,6)', '<GND>F(0.00001,-0.5)(1,1)<VCC>B(2,2)(3,3)'])
+def test_tokens_to_route(route):
+    assert tokens_to_route(tokenize_route(route)) == route
+    assert tokens_to_route(compact_route_tokens(compact_route(route))) == route
+
+
+def test_tokenize_arc():
+    assert tokenize_route('B(0,0)A(1,1)(2,0)') == [('b', None), ('p', (0.0, 0.0)), ('a', (1.0, 1.0)), ('p', (2.0, 0.0))]
+
+
+def test_expand_arc():
+    expanded = expand_route('f(0,0)a(1,1)(2,0)(3,0)')
+    assert [(s.start, s.end, s.mid) for s in expanded.segments] == [((0, 0), (2, 0), (1, 1)), ((2, 0), (3, 0), None)]
+
+
+@pytest.mark.parametrize('route', ['fA', 'fa1', 'fa(1,1)', 'f(0,0)a(1,1)', 'f(0,0)a(1,1)v', 'f(0,0)a(1,1)a(2,2)(3,3)'])
+def test_arc_invalid(route):
+    with pytest.raises(RouteParseError):
+        expand_route(route)
+
+
+def test_arc_round_trip():
+    route = 'B(0,0)A(1,1)(2,0)x(5,5)F(6,6)A(6.5,7)(7,7)'
+    tokens = tokenize_route(route)
+    assert tokens_to_route(tokens) == route
+    assert compact_route(route)[0] == 'bpapxpfpap'
+    assert compact_route_tokens(json.loads(format_compact_route(compact_route(route)))) == tokens
+
+
+@pytest.mark.parametrize('orientation', [0, 90, -30, 180])
+def test_transform_to_local(orientation):
+    transform = RouteTransform(10000000, -20000000, orientation)
+    for pos in [(0, 0), (1.5, -2.25), (-3, 4)]:
+        assert transform.to_local(transform.to_board(pos)) == pytest.approx(pos, abs=1e-5)
+
+
+@pytest.mark.parametrize('orientation', [0, 90, -30, 180])
+def test_transform_mirror(orientation):
+    transform = RouteTransform(10000000, -20000000, orientation, mirror=True)
+    plain = RouteTransform(10000000, -20000000, orientation)
+    for pos in [(0, 0), (1.5, -2.25), (-3, 4)]:
+        assert transform.to_board(pos) == plain.to_board((-pos[0], pos[1]))  # local x negated, as router.js does
+        assert transform.to_local(transform.to_board(pos)) == pytest.approx(pos, abs=1e-5)
+
+
+def test_transform_layers():
+    assert RouteTransform(0, 0, 0, True, False).to_board_layer('F') == 'F'
+    assert RouteTransform(0, 0, 0, True, True).to_board_layer('F') == 'B'
+    assert RouteTransform(0, 0, 0, True, True).to_board_layer('B') == 'F'
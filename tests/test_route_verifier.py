@@ -0,0 +1,74 @@
+from ergogen.route_parser import RouteTransform
+from ergogen.route_verifier import diff_routes
+
+ROUTES = ['"f(0,0)(2,0)v(2,3)" # net: GND', 'b(5,0)(7,0)']
+REF = (10000000, 20000000, 90.0)
+
+
+def board_items(transform: RouteTransform):
+    # The tracks and vias ROUTES produce, as they would be on the board
+    def seg(start, end, layer):
+        return (transform.to_board(start), transform.to_board(end), layer, None)
+
+    segments = [seg((0, 0), (2, 0), 'F'), seg((2, 0), (2, 3), 'B'), seg((5, 0), (7, 0), 'B')]
+    return segments, [transform.to_board((2, 0))]
+
+
+def test_match():
+    segments, vias = board_items(RouteTransform(*REF))
+    diff = diff_routes(ROUTES, *REF, segments, vias)
+    assert diff.is_match()
+    assert diff.summary() == ['Verification OK: routes reproduce 3 tracks and 1 vias']
+
+
+def test_match_reversed_and_off_by_rounding():
+    segments, vias = board_items(RouteTransform(*REF))
+    segments = [(end, (start[0] + 20, start[1] - 20), layer, None) for start, end, layer, _ in segments]
+    assert diff_routes(ROUTES, *REF, segments, vias).is_match()
+
+
+def test_mismatch():
+    segments, vias = board_items(RouteTransform(*REF))
+    missing = ((0, 0), (1000000, 0), 'F', None)
+    diff = diff_routes(ROUTES, *REF, segments[1:] + [missing], [])
+    assert not diff.is_match()
+    assert diff.missing_segments == [missing]
+    assert diff.extra_segments == [segments[0]]
+    assert diff.extra_vias == vias
+    assert diff.missing_vias == []
+    assert diff.summary()[0] == 'Verification FAILED: 1 tracks missing, 1 extra tracks, 0 vias missing, 1 extra vias'
+
+
+def test_wrong_layer():
+    segments, vias = board_items(RouteTransform(*REF))
+    start, end, _, _ = segments[2]
+    diff = diff_routes(ROUTES, *REF, segments[:2] + [(start, end, 'F', None)], vias)
+    assert len(diff.missing_segments) == 1 and len(diff.extra_segments) == 1
+
+
+def test_duplicates_counted():
+    segments, vias = board_items(RouteTransform(*REF))
+    diff = diff_routes(ROUTES, *REF, segments + segments[:1], vias + vias)
+    assert diff.missing_segments == segments[:1]
+    assert diff.missing_vias == vias
+
+
+def test_arc():
+    transform = RouteTransform(*REF)
+    arc = (transform.to_board((5, 0)), transform.to_board((7, 0)), 'B', transform.to_board((6, 1)))
+    assert diff_routes(['b(5,0)a(6,1)(7,0)'], *REF, [arc], []).is_match()
+    assert diff_routes(['b(7,0)a(6,1)(5,0)'], *REF, [arc], []).is_match()
+    assert not diff_routes(['b(5,0)(7,0)'], *REF, [arc], []).is_match()  # an arc needs its mid point
+    assert not diff_routes(['b(5,0)a(6,-1)(7,0)'], *REF, [arc], []).is_match()
+    assert not diff_routes(['b(5,0)a(6,1)(7,0)'], *REF, [arc[:3] + (None,)], []).is_match()
+
+
+def test_mirrored():
+    transform = RouteTransform(*REF, mirror=True, swap_layers=True)
+    segments = [(transform.to_board(start), transform.to_board(end), transform.to_board_layer(layer), None)
+                for start, end, layer in (((0, 0), (2, 0), 'F'), ((2, 0), (2, 3), 'B'), ((5, 0), (7, 0), 'B'))]
+    vias = [transform.to_board((2, 0))]
+    assert segments[0][2] == 'B'
+    assert diff_routes(ROUTES, *REF, segments, vias, mirror=True, swap_layers=True).is_match()
+    assert not diff_routes(ROUTES, *REF, segments, vias, mirror=True).is_match()
+    assert not diff_routes(ROUTES, *REF, segments, vias).is_match()
@@ -0,0 +1,139 @@
+import pytest
+from ergogen.route_parser import RouteParseError
+from ergogen.router_config import parse_compact_route, parse_router_blocks, replace_block_routes
+
+CONFIG = '''pcbs:
+  keyboard:
+    footprints:
+      switch:
+        what: choc
+        where: true
+      # routes of the keys
+      key_routes:
+        what: router
+        where: "/matrix_.*/"
+        params:
+          net: "{{colrow}}"
+          locked: true
+          route: "f(0,0)(1,0)"
+          routes:
+            - "b(0,0)(0,1)" # net: GND
+
+            - b(2,2)(3,3)
+          compact_routes:
+            - ["fpp", 0, 0, 1, 1] # net: VCC
+      other_routes:
+        what: 'router'
+        where: matrix_one
+        params:
+          routes: ["f(5,5)(6,6)"]
+          compact_routes: [["bpp", 1, 1, 2, 2]]
+    outlines: {}
+'''
+
+
+def test_parse_blocks():
+    lines = CONFIG.split('\n')
+    blocks = parse_router_blocks(CONFIG)
+    assert [block.name for block in blocks] == ['key_routes', 'other_routes']
+
+    block = blocks[0]
+    assert block.where == '"/matrix_.*/"'
+    assert block.params == {'net': '{{colrow}}', 'locked': 'true'}
+    assert block.routes == ['"f(0,0)(1,0)"', '"b(0,0)(0,1)" # net: GND', 'b(2,2)(3,3)']
+    assert block.compact_routes == [['fpp', 0, 0, 1, 1]]
+    assert lines[block.first_line] == '      key_routes:'
+    assert lines[block.last_line] == '            - ["fpp", 0, 0, 1, 1] # net: VCC'
+
+    block = blocks[1]
+    assert block.where == 'matrix_one'
+    assert block.routes == ['"f(5,5)(6,6)"']
+    assert block.compact_routes == [['bpp', 1, 1, 2, 2]]
+    assert lines[block.last_line] == '          compact_routes: [["bpp", 1, 1, 2, 2]]'
+
+
+def test_expand_block():
+    expanded = parse_router_blocks(CONFIG)[0].expand()
+    assert [(s.start, s.end, s.layer) for s in expanded.segments] == [((0, 0), (1, 0), 'F'), ((0, 0), (0, 1), 'B'), ((2, 2), (3, 3), 'B'),
+                                                                      ((0, 0), (1, 1), 'F')]
+
+
+def test_plugin_output():
+    # Top level block, as the plugin generates it
+    text = 'key_routes:\n  what: router\n  where: true\n  params:\n    net: GND\n    trace_width: 0.25\n    routes:\n      - "f(0,0)(1,0)"\n'
+    block, = parse_router_blocks(text)
+    assert block.name == 'key_routes'
+    assert block.get_number_param('trace_width', 0.2) == 0.25
+    assert block.get_number_param('via_size', 0.6) == 0.6
+    assert block.get_number_param('net', 0.6) == 0.6
+    assert (block.first_line, block.last_line) == (0, 7)
+
+
+def test_no_blocks():
+    assert parse_router_blocks('switch:\n  what: choc\n  where: true\n') == []
+
+
+def test_parse_compact_route():
+    assert parse_compact_route('["fp", 1, 2.5] # remark') == ['fp', 1, 2.5]
+    with pytest.raises(RouteParseError):
+        parse_compact_route('"fp", 1, 2.5')
+
+
+BLOCK = '''pcbs:
+  keyboard:
+    footprints:
+      key_routes:
+        what: router
+        where: /key/  # keys only
+        params:
+          net: GND
+          width: 0.3
+          locked: true
+          # generated
+          route: "b(9,9)(9,8)"
+          routes:
+            - "f(0,0)(1,0)" # net: GND
+
+            - "f(5,5)(6,5)"
+          via_size: 0.7
+        adjust:
+          shift: [1, 1]
+'''
+
+
+def test_replace_block_routes():
+    block, = parse_router_blocks(BLOCK)
+    assert replace_block_routes(block, ['"f(0,0)(1,0)" # net: GND', '"f(5,5)(6,6)"'], 'routes', {}, 2) == '''  key_routes:
+    what: router
+    where: /key/  # keys only
+    params:
+      net: GND
+      width: 0.3
+      locked: true
+      # generated
+      routes:
+        - "f(0,0)(1,0)" # net: GND
+        - "f(5,5)(6,6)"
+      via_size: 0.7
+    adjust:
+      shift: [1, 1]
+'''
+
+
+def test_replace_block_routes_params():
+    block, = parse_router_blocks(BLOCK.replace('          locked: true\n', '          mirror: false # halves\n          locked: true\n'))
+    replaced = replace_block_routes(block, ['["fpp", 0, 0, 1, 0]'], 'compact_routes', {'mirror': 'true', 'mirror_layers': 'true'}, 4)
+    # Moved to the given indentation, keeping the block's own
+    assert replaced.split('\n')[:12] == ['    key_routes:', '      what: router', '      where: /key/  # keys only', '      params:',
+                                         '        mirror_layers: true', '        net: GND', '        width: 0.3', '        mirror: true',
+                                         '        locked: true', '        # generated', '        compact_routes:', '          - ["fpp", 0, 0, 1, 0]']
+    replaced_block, = parse_router_blocks(replaced)
+    assert replaced_block.params == {'mirror_layers': 'true', 'net': 'GND', 'width': '0.3', 'mirror': 'true', 'locked': 'true', 'via_size': '0.7'}
+    assert replaced_block.compact_routes == [['fpp', 0, 0, 1, 0]] and replaced_block.routes == []
+
+
+def test_replace_block_routes_no_routes():
+    block, = parse_router_blocks('routes:\n  what: router\n  where: true\n')
+    assert replace_block_routes(block, ['"f(0,0)(1,0)"'], 'routes', {'mirror': 'true'}, 2) == ('  routes:\n    what: router\n    where: true\n'
+                                                                                            '    params:\n      mirror: true\n      routes:\n'
+                                                                                            '        - "f(0,0)(1,0)"\n')
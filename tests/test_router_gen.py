@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('pcbnew')  # the generator works on pcbnew items
+
+from ergogen.router_config import parse_router_blocks  # noqa: E402
+from ergogen.router_gen import RouterGen  # noqa: E402
+
+CONFIG = '''footprints:
+  key_routes:
+    what: router
+    where: /key/
+    params:
+      net: GND
+      width: 0.3
+      locked: true
+      routes:
+        - "f(0,0)(1,0)"
+        - "f(5,5)(6,5)"
+'''
+
+
+class Board:
+    def GetConnectivity(self):
+        return None
+
+
+def test_diff_full_block_keeps_params():
+    block, = parse_router_blocks(CONFIG)
+    yaml, has_block = RouterGen(Board()).get_routes_diff_yaml(block, ['"f(1,0)(0,0)"', '"f(5,5)(6,6)"'], 2, 'key_routes', 'true', False, True,
+                                                               full_block=True)
+    assert has_block
+    assert yaml.endswith(CONFIG.replace('"f(5,5)(6,5)"', '"f(5,5)(6,6)"'))
+    assert yaml.startswith('# Diff against existing key_routes block: 1 unchanged, 0 added, 0 removed, 1 changed\n')
@@ -0,0 +1,30 @@
+from ergogen.spatial import GridIndex
+
+
+def test_query():
+    index: GridIndex[str] = GridIndex(10)
+    index.insert(0, 0, 'origin')
+    index.insert(3, 4, 'near')
+    index.insert(9.9, 0, 'cell edge')
+    index.insert(-25, -25, 'far negative')
+    index.insert(3, 4, 'stacked')
+    assert len(index) == 5
+    assert sorted(index.query(0, 0, 5)) == ['near', 'origin', 'stacked']  # radius is inclusive
+    assert sorted(index.query(0, 0, 4.9)) == ['origin']
+    assert sorted(index.query(12, 0, 2.1)) == ['cell edge']
+    assert list(index.query(-24, -24, 1.5)) == ['far negative']
+    assert list(index.query(100, 100, 50)) == []
+
+
+def test_query_larger_than_cells():
+    index: GridIndex[int] = GridIndex(1)
+    for i in range(-10, 11):
+        index.insert(i, 0, i)
+    assert sorted(index.query(0, 0, 7.5)) == list(range(-7, 8))
+
+
+def test_cell_of():
+    index: GridIndex[int] = GridIndex(1000)
+    assert index.cell_of(0, 999) == (0, 0)
+    assert index.cell_of(1000, -1) == (1, -1)
+    assert len(index) == 0
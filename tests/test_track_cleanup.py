@@ -0,0 +1,137 @@
+from ergogen.items import ItemList, ItemUuid
+from ergogen.track_cleanup import CleanupConnectivity, MergedTrack, cleanup_tracks
+
+
+class Item:
+    # Track, arc or via with just what cleanup uses of pcbnew items
+    def __init__(self, uuid, start, end=None, net='GND', layer='F.Cu', kind='Track', locked=False):
+        self.m_Uuid = ItemUuid(uuid)
+        self.start = start
+        self.end = start if end is None else end
+        self.net = net
+        self.layer = layer
+        self.kind = kind
+        self.locked = locked
+
+    def Cast(self):
+        return self
+
+    def GetTypeDesc(self):
+        return self.kind
+
+    def GetX(self):
+        return self.start[0]
+
+    def GetY(self):
+        return self.start[1]
+
+    def GetEndX(self):
+        return self.end[0]
+
+    def GetEndY(self):
+        return self.end[1]
+
+    def GetNetname(self):
+        return self.net
+
+    def GetNetCode(self):
+        return 1
+
+    def GetLayerName(self):
+        return self.layer
+
+    def IsLocked(self):
+        return self.locked
+
+
+def by_uuid(*items):
+    return {item.m_Uuid.AsString(): item for item in items}
+
+
+def test_no_changes():
+    tracks = by_uuid(Item('t1', (0, 0), (1000000, 0)), Item('t2', (1000000, 0), (1000000, 1000000)))
+    vias = by_uuid(Item('v1', (0, 0), kind='Via'))
+    result = cleanup_tracks(tracks, vias)
+    assert not result.has_changes()
+    assert result.tracks == tracks and result.vias == vias
+
+
+def test_duplicate_vias():
+    v1, v2, v3, v4 = Item('v1', (0, 0), kind='Via'), Item('v2', (500, 0), kind='Via'), Item('v3', (0, 0), net='VCC', kind='Via'), Item('v4', (5000, 0), kind='Via')
+    result = cleanup_tracks({}, by_uuid(v1, v2, v3, v4))
+    assert list(result.vias) == ['v1', 'v3', 'v4']
+    assert result.replaced == {'v2': v1}
+    assert result.duplicate_vias == 1
+
+
+def test_duplicate_tracks():
+    t1 = Item('t1', (0, 0), (1000000, 0))
+    t2 = Item('t2', (1000000, 0), (0, 0))  # reversed
+    t3 = Item('t3', (0, 0), (1000000, 0), layer='B.Cu')
+    t4 = Item('t4', (0, 0), (1000000, 0), net='VCC')
+    result = cleanup_tracks(by_uuid(t1, t2, t3, t4), {})
+    assert list(result.tracks) == ['t1', 't3', 't4']
+    assert result.replaced == {'t2': t1}
+    assert result.duplicate_tracks == 1 and result.merged_tracks == 0
+
+
+def test_merge_colinear():
+    t1 = Item('t1', (0, 0), (2000000, 2000000))
+    t2 = Item('t2', (3000000, 3000000), (1000000, 1000000))  # overlaps t1, reversed
+    t3 = Item('t3', (2500000, 2500000), (5000000, 5000000))  # overlaps t2 only
+    t4 = Item('t4', (5000000, 5000000), (6000000, 6000000))  # only touches t3
+    t5 = Item('t5', (0, 0), (2000000, 2000000), layer='B.Cu')
+    result = cleanup_tracks(by_uuid(t1, t2, t3, t4, t5), {})
+    merged = result.tracks['merged-t1']
+    assert isinstance(merged, MergedTrack)
+    assert (merged.start, merged.end) == ((0, 0), (5000000, 5000000))
+    assert (merged.GetNetname(), merged.GetLayerName(), merged.GetTypeDesc()) == ('GND', 'F.Cu', 'Track')
+    assert sorted(result.tracks) == ['merged-t1', 't4', 't5']
+    assert result.replaced == {'t1': merged, 't2': merged, 't3': merged}
+    assert result.merged_tracks == 3
+
+
+def test_merge_duplicate_of_merged():
+    t1 = Item('t1', (0, 0), (2000000, 0))
+    t2 = Item('t2', (1000000, 0), (3000000, 0))
+    t3 = Item('t3', (2000000, 0), (0, 0))  # duplicate of t1, which is merged in turn
+    result = cleanup_tracks(by_uuid(t1, t2, t3), {})
+    merged = result.tracks['merged-t1']
+    assert result.replaced == {'t1': merged, 't2': merged, 't3': merged}
+
+
+def test_arcs_not_merged():
+    a1 = Item('a1', (0, 0), (2000000, 0), kind='Arc')
+    a2 = Item('a2', (1000000, 0), (3000000, 0), kind='Arc')
+    for arc, mid in ((a1, (1000000, 500000)), (a2, (2000000, 500000))):
+        arc.GetMid = lambda mid=mid: type('Point', (), {'x': mid[0], 'y': mid[1]})()
+    result = cleanup_tracks(by_uuid(a1, a2), {})
+    assert not result.has_changes()
+
+
+class Connectivity:
+    def __init__(self, tracks, pads):
+        self.tracks = tracks
+        self.pads = pads
+
+    def GetConnectedTracks(self, item):
+        return ItemList(self.tracks.get(item.m_Uuid.AsString(), []))
+
+    def GetConnectedPads(self, item):
+        return ItemList(self.pads.get(item.m_Uuid.AsString(), []))
+
+
+def test_connectivity():
+    t1 = Item('t1', (0, 0), (2000000, 0))
+    t2 = Item('t2', (1000000, 0), (3000000, 0))
+    t3 = Item('t3', (3000000, 0), (3000000, 1000000))
+    v1, v2 = Item('v1', (0, 0), kind='Via'), Item('v2', (0, 0), kind='Via')
+    pad = Item('p1', (3000000, 1000000), kind='Pad')
+    result = cleanup_tracks(by_uuid(t1, t2, t3), by_uuid(v1, v2))
+    merged = result.tracks['merged-t1']
+    connectivity = CleanupConnectivity(Connectivity({'t1': [t2, v2], 't2': [t1, t3], 't3': [t2], 'v1': [t1]}, {'t3': [pad], 't2': [pad]}),
+                                       result)
+    assert list(connectivity.GetConnectedTracks(merged)) == [v1, t3]
+    assert list(connectivity.GetConnectedTracks(t3)) == [merged]
+    assert connectivity.GetConnectedTracks(v1).size() == 1
+    assert list(connectivity.GetConnectedPads(merged)) == [pad]